@@ -0,0 +1,79 @@
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+
+class RateLimiter:
+    """Token buckets keyed by id, bounded in memory.
+
+    Each key refills at `rate` tokens/second up to `burst`. A bucket idle for
+    `burst / rate` seconds is full again, so it is evicted without changing
+    behaviour; `max_keys` caps memory when many keys are active at once.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.idle = burst / rate
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at]
+
+    def tokens(self, key, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        return min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+    def take(self, key, cost: float, now: float):
+        self._buckets[key] = [self.tokens(key, now) - cost, now]
+        self._buckets.move_to_end(key)
+        self._evict(now)
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _evict(self, now: float):
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self.max_keys and now - updated < self.idle:
+                break
+            del self._buckets[key]
+
+
+class AdmissionControl:
+    """Per-user and per-guild rate limits checked before a command runs.
+
+    A command is admitted only if both the user's and the guild's bucket can
+    pay its cost; rejected commands consume nothing.
+    """
+
+    def __init__(self, user_rate: float, user_burst: float, guild_rate: float, guild_burst: float,
+                 costs: Optional[dict] = None, max_keys: int = 100000):
+        self.users = RateLimiter(user_rate, user_burst, max_keys)
+        self.guilds = RateLimiter(guild_rate, guild_burst, max_keys)
+        self.costs = costs or {}
+        self.admitted = Counter()  # command name -> count
+        self.rejected = Counter()
+
+    def admit(self, user_id: int, guild_id: Optional[int], command: str) -> bool:
+        now = time.monotonic()
+        cost = self.costs.get(command, 1)
+        allowed = self.users.tokens(user_id, now) >= cost
+        if allowed and guild_id is not None:
+            allowed = self.guilds.tokens(guild_id, now) >= cost
+        if not allowed:
+            self.rejected[command] += 1
+            return False
+        self.users.take(user_id, cost, now)
+        if guild_id is not None:
+            self.guilds.take(guild_id, cost, now)
+        self.admitted[command] += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "admitted": sum(self.admitted.values()),
+            "rejected": sum(self.rejected.values()),
+            "tracked_users": len(self.users),
+            "tracked_guilds": len(self.guilds),
+        }
@@ -0,0 +1,156 @@
+# backup.py - streaming export/import of the economy database
+#
+# Usage: python backup.py export <dir> [<collection> ...]
+#        python backup.py import <dir> [<collection> ...]
+# Each collection is written to <dir>/<collection>.jsonl.gz, one Extended JSON
+# document per line, plus a manifest.json with document counts. Export and
+# import both go BATCH_SIZE documents at a time, so memory use doesn't grow
+# with the number of users. Import upserts by _id and records its progress in
+# <dir>/import.checkpoint; re-running it after a failure resumes from there,
+# as long as the checkpoint is for the same export and target database.
+# Import into an empty database (or one restored from the same backup): a user
+# with the same user_id under a different _id violates the unique index.
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+import motor.motor_asyncio
+from bson import json_util
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+BATCH_SIZE = 1000
+DATABASE = "vrtex_economy"
+COLLECTIONS = ["users", "servers", "guild_members", "ledger_snapshots", "ledger"]
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+
+
+def _target(uri: str) -> str:
+    """Identifies the database an import writes to, without putting credentials on disk."""
+    return hashlib.sha256(f"{uri}/{DATABASE}".encode()).hexdigest()[:16]
+
+
+def _path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.jsonl.gz")
+
+
+def _write_json(path: str, data: dict):
+    # Write-then-rename so a crash never leaves a half-written file behind
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _read_json(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+async def export(db, directory: str, names):
+    os.makedirs(directory, exist_ok=True)
+    # Progress of an import from an earlier export means nothing for this one
+    checkpoint_path = os.path.join(directory, "import.checkpoint")
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    manifest = {"exported_at": datetime.utcnow().isoformat(), "counts": {}}
+    for name in names:
+        path = _path(directory, name)
+        count = 0
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as out:
+            # _id order keeps the export streaming off the _id index
+            cursor = db[name].find({}).sort("_id", 1).batch_size(BATCH_SIZE)
+            async for doc in cursor:
+                out.write(json_util.dumps(doc, json_options=JSON_OPTIONS) + "\n")
+                count += 1
+                if count % BATCH_SIZE == 0:
+                    print(f"{name}: exported {count} documents", flush=True)
+        os.replace(path + ".tmp", path)
+        manifest["counts"][name] = count
+        print(f"{name}: exported {count} documents to {path}")
+    _write_json(os.path.join(directory, "manifest.json"), manifest)
+
+
+async def restore(db, directory: str, names, target: str):
+    manifest = _read_json(os.path.join(directory, "manifest.json"))
+    totals = manifest.get("counts", {})
+    checkpoint_path = os.path.join(directory, "import.checkpoint")
+    saved = _read_json(checkpoint_path)
+    run = {"exported_at": manifest.get("exported_at"), "target": target}
+    if saved and all(saved.get(key) == value for key, value in run.items()):
+        print(f"Resuming import from {checkpoint_path}")
+    elif saved:
+        print(f"Ignoring {checkpoint_path}: it is from another export or target database")
+        saved = {}
+    checkpoint = saved.get("done", {})  # collection -> documents already imported
+
+    for name in names:
+        path = _path(directory, name)
+        if not os.path.exists(path):
+            print(f"{name}: no {path}, skipping")
+            continue
+        done = checkpoint.get(name, 0)
+        total = totals.get(name, "?")
+        line = 0
+        batch = []
+
+        async def write(batch, done):
+            try:
+                await db[name].bulk_write(
+                    [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch], ordered=False
+                )
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                print(f"{name}: {len(errors)} documents failed after {done} imported, "
+                      f"first error: {errors[0]['errmsg'] if errors else e}")
+                raise
+            done += len(batch)
+            checkpoint[name] = done
+            _write_json(checkpoint_path, {**run, "done": checkpoint})
+            print(f"{name}: imported {done}/{total} documents", flush=True)
+            return done
+
+        with gzip.open(path, "rt", encoding="utf-8") as source:
+            for text in source:
+                line += 1
+                if line <= done:
+                    continue  # imported before the last run stopped
+                batch.append(json_util.loads(text, json_options=JSON_OPTIONS))
+                if len(batch) >= BATCH_SIZE:
+                    done = await write(batch, done)
+                    batch = []
+        if batch:
+            done = await write(batch, done)
+        print(f"{name}: import complete ({done} documents)")
+
+    # Every requested collection is in; a later import starts from scratch
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+async def run(action: str, directory: str, names):
+    uri = os.getenv("MONGO_URI")
+    client = motor.motor_asyncio.AsyncIOMotorClient(uri)
+    db = client[DATABASE]
+    if action == "export":
+        await export(db, directory, names)
+    else:
+        await restore(db, directory, names, _target(uri))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in ("export", "import"):
+        print(f"Usage: python backup.py <export|import> <dir> [{'|'.join(COLLECTIONS)} ...]")
+        sys.exit(1)
+    action, directory, names = args[0], args[1], args[2:] or COLLECTIONS
+    unknown = [name for name in names if name not in COLLECTIONS]
+    if unknown:
+        print(f"Unknown collections: {', '.join(unknown)}")
+        sys.exit(1)
+    asyncio.run(run(action, directory, names))
@@ -0,0 +1,247 @@
+# bench.py - offline command throughput benchmark
+#
+# Usage: python bench.py [--users N] [--calls N] [--concurrency N] [--latency-ms X] [--json]
+# Drives the real slash command handlers from main.py with fake interactions
+# against the in-memory Mongo stand-in (memory_mongo.py), so it needs neither
+# a Discord token nor a MongoDB server. Results are deterministic for a given
+# --seed apart from timings, which makes runs comparable across commits.
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+os.environ["MONGO_URI"] = "memory://"  # must be set before main creates its client
+
+import discord  # noqa: E402
+
+import main  # noqa: E402
+
+# command -> relative weight in the generated workload
+WORKLOAD = {
+    "beg": 15,
+    "rob": 15,
+    "work": 15,
+    "daily": 10,
+    "deposit": 10,
+    "buy": 10,
+    "withdraw": 5,
+    "use": 5,
+    "job": 5,
+    "recap": 5,
+    "global_leaderboard": 5,
+    "server_leaderboard": 3,
+    "weekly": 2,
+}
+
+
+class FakeResponse:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, content=None, **kwargs):
+        self.messages.append(content)
+
+    async def edit_message(self, content=None, **kwargs):
+        self.messages.append(content)
+
+    async def defer(self, **kwargs):
+        pass
+
+    def is_done(self) -> bool:
+        return bool(self.messages)
+
+
+class FakeMember:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.bot = False
+        self.mention = f"<@{user_id}>"
+        self.guild_permissions = discord.Permissions.none()
+
+    async def send(self, content=None, **kwargs):
+        pass
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+
+
+class FakeInteraction:
+    """The attributes of discord.Interaction that the command handlers use."""
+
+    def __init__(self, user: FakeMember, guild: FakeGuild):
+        self.user = user
+        self.guild = guild
+        self.response = FakeResponse()
+        self.extras = {}
+        self.command = None
+
+
+async def seed(rng: random.Random, users: int, guilds: int):
+    """Insert `users` user documents spread over `guilds` guilds (untraced)."""
+    now = datetime.utcnow()
+    docs, members = [], []
+    for user_id in range(1, users + 1):
+        docs.append({
+            "user_id": user_id,
+            "balance": rng.randint(0, 100000),
+            "bank": rng.randint(0, 50000),
+            "work_streak": 0,
+            "job": rng.choice([None, *main.jobs_list]),
+            "job_level": rng.randint(1, 3),
+            "last_work": now - timedelta(hours=rng.uniform(0, 30)),
+            "vRTEX_plus": rng.random() < 0.1,
+            "inventory": {},
+        })
+        members.append({"guild_id": guild_of(user_id, guilds), "user_id": user_id, "balance": docs[-1]["balance"]})
+    await main.db.users.insert_many(docs)
+    await main.db.guild_members.insert_many(members)
+    await main.leaderboards.load()
+
+
+def guild_of(user_id: int, guilds: int) -> int:
+    return 1000 + user_id % guilds
+
+
+def plan(rng: random.Random, calls: int, users: int, targets: int):
+    """Yield (command, user_id, args) for the whole run."""
+    names = list(WORKLOAD)
+    weights = list(WORKLOAD.values())
+    item_names = [item["name"] for item in main.catalog.items.values()]
+    for _ in range(calls):
+        name = rng.choices(names, weights)[0]
+        user_id = rng.randint(1, users)
+        args = ()
+        if name in ("deposit", "withdraw"):
+            args = (rng.randint(1, 5000),)
+        elif name == "buy":
+            args = (rng.choice(list(main.catalog.items)),)
+        elif name == "use":
+            args = (rng.choice(item_names),)
+        elif name == "rob":
+            # A small set of victims shared by everyone: contended documents
+            args = (FakeMember(rng.randint(1, min(targets, users))),)
+        yield name, user_id, args
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    random.seed(args.seed)  # the commands draw from the module-level generator
+    main.client.latency = args.latency_ms / 1000
+    await seed(rng, args.users, args.guilds)
+
+    callbacks = {name: main.bot.tree.get_command(name).callback for name in WORKLOAD}
+    samples = defaultdict(list)  # command -> [(seconds, mongo ops)]
+    errors = defaultdict(int)
+    rejected = defaultdict(int)
+    invocations = iter(plan(rng, args.calls, args.users, args.targets))
+
+    async def worker():
+        for name, user_id, params in invocations:
+            guild_id = guild_of(user_id, args.guilds)
+            if args.admission and not main.admission.admit(user_id, guild_id, name):
+                rejected[name] += 1
+                continue
+            interaction = FakeInteraction(FakeMember(user_id), FakeGuild(guild_id))
+            started = time.perf_counter()
+            try:
+                with main.tracer.span(name) as trace:
+                    await callbacks[name](interaction, *params)
+            except Exception:
+                errors[name] += 1
+                continue
+            samples[name].append((time.perf_counter() - started, len(trace.ops)))
+            main.stat_counters.incr(user_id, commands_used=1)  # on_app_command_completion
+
+    async def flusher():
+        # The bot's background loops, on a shorter interval to fit the run
+        while True:
+            await asyncio.sleep(args.flush_seconds)
+            await flush(samples)
+
+    background = asyncio.create_task(flusher())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+    background.cancel()
+    await flush(samples)
+    return report(samples, errors, rejected, duration)
+
+
+async def flush(samples):
+    buffers = (("flush_stats", main.stat_counters), ("flush_guild_members", main.guild_members),
+               ("flush_ledger", main.ledger))
+    for name, buffer in buffers:
+        started = time.perf_counter()
+        with main.tracer.span(name) as trace:
+            written = await buffer.flush()
+        if written:
+            samples[name].append((time.perf_counter() - started, len(trace.ops)))
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def report(samples, errors, rejected, duration: float) -> dict:
+    commands = {}
+    for name in sorted(set(samples) | set(errors) | set(rejected)):
+        timings = [seconds for seconds, _ in samples[name]]
+        ops = [count for _, count in samples[name]]
+        commands[name] = {
+            "calls": len(timings),
+            "errors": errors[name],
+            "rejected": rejected[name],
+            "p50_ms": percentile(timings, 0.5) * 1000 if timings else 0.0,
+            "p99_ms": percentile(timings, 0.99) * 1000 if timings else 0.0,
+            "ops_per_call": sum(ops) / len(ops) if ops else 0.0,
+        }
+    calls = sum(stats["calls"] for name, stats in commands.items() if name in WORKLOAD)
+    return {
+        "duration_s": duration,
+        "calls": calls,
+        "commands_per_s": calls / duration if duration else 0.0,
+        "commands": commands,
+        "user_cache": main.user_cache.stats(),
+    }
+
+
+def print_report(result: dict):
+    print(f"{'command':<22}{'calls':>8}{'errors':>8}{'rejected':>10}{'p50 ms':>10}{'p99 ms':>10}{'ops/call':>10}")
+    for name, stats in result["commands"].items():
+        print(f"{name:<22}{stats['calls']:>8}{stats['errors']:>8}{stats['rejected']:>10}"
+              f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['ops_per_call']:>10.2f}")
+    print(f"\n{result['calls']} commands in {result['duration_s']:.2f}s: "
+          f"{result['commands_per_s']:.0f} commands/sec")
+    cache = result["user_cache"]
+    print(f"User cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.1%})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the slash commands against in-memory Mongo.")
+    parser.add_argument("--users", type=int, default=5000, help="seeded users (default 5000)")
+    parser.add_argument("--guilds", type=int, default=20, help="guilds the users are spread over")
+    parser.add_argument("--calls", type=int, default=20000, help="command invocations to run")
+    parser.add_argument("--concurrency", type=int, default=200, help="commands in flight at once")
+    parser.add_argument("--targets", type=int, default=25, help="users everyone tries to /rob (contention)")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="simulated Mongo round trip")
+    parser.add_argument("--flush-seconds", type=float, default=0.5, help="stat/member flush interval")
+    parser.add_argument("--admission", action="store_true", help="apply the per-user/guild rate limits")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
@@ -0,0 +1,38 @@
+import hashlib
+import json
+from datetime import datetime
+
+
+def tree_fingerprint(tree) -> str:
+    """Hash of the global command payloads Discord would receive on sync."""
+    payloads = [command.to_dict(tree) for command in tree.get_commands()]
+    names = [payload["name"] for payload in payloads]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise RuntimeError(f"Duplicate slash commands registered: {', '.join(sorted(duplicates))}")
+    payloads.sort(key=lambda payload: payload["name"])
+    blob = json.dumps(payloads, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+async def sync_if_changed(bot, collection) -> bool:
+    """Sync the command tree only when its fingerprint differs from the last sync.
+
+    The fingerprint is stored per application in `collection`, so restarts,
+    reconnects and redeploys without command changes skip the global sync.
+    """
+    fingerprint = tree_fingerprint(bot.tree)
+    key = f"command_tree:{bot.application_id}"
+    stored = await collection.find_one({"_id": key})
+    if stored and stored.get("fingerprint") == fingerprint:
+        print("Slash commands unchanged; skipping sync")
+        return False
+
+    synced = await bot.tree.sync()
+    await collection.update_one(
+        {"_id": key},
+        {"$set": {"fingerprint": fingerprint, "synced_at": datetime.utcnow()}},
+        upsert=True
+    )
+    print(f"Synced {len(synced)} slash commands")
+    return True
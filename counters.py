@@ -0,0 +1,62 @@
+from collections import Counter, defaultdict
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from user_repository import upsert_update
+
+
+class StatCounters:
+    """Write-behind aggregator for per-user analytics counters.
+
+    Commands call `incr` instead of writing; increments for the same user are
+    summed in memory and `flush` applies them all with one unordered
+    bulk_write. These counters only feed `/recap`, so they don't need to be
+    atomic with the balance change that caused them.
+    """
+
+    def __init__(self, collection, cache=None):
+        self.collection = collection
+        self.cache = cache  # optional UserCache to keep in step with flushed counts
+        self._pending = defaultdict(Counter)  # user_id -> field -> amount
+
+    def incr(self, user_id: int, **amounts: int):
+        self._pending[user_id].update(amounts)
+
+    def pending(self, user_id: int) -> dict:
+        """Increments recorded for a user that haven't been flushed yet."""
+        return dict(self._pending.get(user_id, {}))
+
+    def merged(self, user: dict) -> dict:
+        """Return a copy of a user document with pending increments applied."""
+        merged = dict(user)
+        for field, amount in self.pending(user["user_id"]).items():
+            merged[field] = merged.get(field, 0) + amount
+        return merged
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, defaultdict(Counter)
+        ops = [
+            UpdateOne({"user_id": user_id}, upsert_update(inc=dict(counts)), upsert=True)
+            for user_id, counts in pending.items()
+        ]
+        try:
+            await self.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: everything except the reported write errors was applied
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            self._requeue(item for i, item in enumerate(pending.items()) if i in failed)
+            raise
+        except BaseException:
+            self._requeue(pending.items())
+            raise
+        if self.cache is not None:
+            for user_id, counts in pending.items():
+                self.cache.apply_inc(user_id, counts)
+        return len(ops)
+
+    def _requeue(self, items):
+        for user_id, counts in items:
+            self._pending[user_id].update(counts)
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from user_repository import upsert_update
+
+
+class EconomyOps:
+    """Balance-changing operations, each done as one conditional write.
+
+    The checks a command used to do in Python (enough coins, cooldown over)
+    live in the update filter instead, so concurrent commands can't both pass
+    a check and overwrite each other's balance. Every method returns the
+    updated document, or None when the condition didn't hold.
+
+    Returned documents are written through to the repository's user cache,
+    which lets `claim` and `credit_once` reject cooldowns without touching
+    the database (and failed conditions too, when the cache is exclusive).
+    """
+
+    def __init__(self, client, collection, repo):
+        self.client = client
+        self.collection = collection
+        self.repo = repo
+        self.cache = repo.cache
+
+    async def claim(self, user_id: int, field: str, cooldown: timedelta, amount: int,
+                    inc: Optional[dict] = None, conditions: Optional[dict] = None) -> Optional[dict]:
+        """Pay `amount` and stamp `field` with the current time if `cooldown` has passed."""
+        now = datetime.utcnow()
+        cached = self.cache.get(user_id)
+        if cached is not None and not self._claimable(cached, field, now - cooldown, self._trusted(conditions)):
+            return None
+
+        query = {
+            "user_id": user_id,
+            "$or": [{field: None}, {field: {"$lte": now - cooldown}}],
+            **(conditions or {})
+        }
+        update = {
+            "$set": {field: now},
+            "$inc": {"balance": amount, **(inc or {})}
+        }
+        doc = await self._update(query, update)
+        if doc is None:
+            # A missing user can't match the filter; create them and try once more
+            user = await self.repo.get_or_create(user_id)
+            if user.get(field) is None:
+                doc = await self._update(query, update)
+        return doc
+
+    async def credit_once(self, user_id: int, key_field: str, key: str, amount: int,
+                          target: str = "balance", conditions: Optional[dict] = None) -> Optional[dict]:
+        """Add `amount` to `target` unless `key_field` already holds `key` (one payout per period)."""
+        cached = self.cache.get(user_id)
+        if cached is not None and not self._creditable(cached, key_field, key, self._trusted(conditions)):
+            return None
+        return await self._update(
+            {"user_id": user_id, key_field: {"$ne": key}, **(conditions or {})},
+            {"$inc": {target: amount}, "$set": {key_field: key}}
+        )
+
+    async def move(self, user_id: int, source: str, target: str, amount: int) -> Optional[dict]:
+        """Move `amount` between two of a user's fields (e.g. balance -> bank)."""
+        return await self._update(
+            {"user_id": user_id, source: {"$gte": amount}},
+            {"$inc": {source: -amount, target: amount}}
+        )
+
+    async def spend(self, user_id: int, amount: int, inc: Optional[dict] = None,
+                    conditions: Optional[dict] = None) -> Optional[dict]:
+        """Take `amount` from the user's balance if they can afford it."""
+        return await self._update(
+            {"user_id": user_id, "balance": {"$gte": amount}, **(conditions or {})},
+            {"$inc": {"balance": -amount, **(inc or {})}}
+        )
+
+    async def consume(self, user_id: int, field: str, count: int = 1) -> Optional[dict]:
+        """Take `count` from a counter (e.g. an inventory slot) if the user holds that many."""
+        return await self._update(
+            {"user_id": user_id, field: {"$gte": count}},
+            {"$inc": {field: -count}}
+        )
+
+    async def transfer(self, from_id: int, to_id: int, amount: int) -> Optional[Tuple[dict, dict]]:
+        """Move `amount` of balance from one user to another in a single transaction.
+
+        Returns (sender, receiver) documents, or None if the sender can't cover it.
+        Transactions need a replica set, which is what Atlas deployments run.
+        Concurrent transfers touching the same user conflict; `with_transaction`
+        retries those (and unknown commit results) until one of them commits.
+        """
+        async def apply(session):
+            sender = await self.collection.find_one_and_update(
+                {"user_id": from_id, "balance": {"$gte": amount}},
+                {"$inc": {"balance": -amount}},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if sender is None:
+                return None
+            receiver = await self.collection.find_one_and_update(
+                {"user_id": to_id},
+                upsert_update(inc={"balance": amount}),
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            return sender, receiver
+
+        async with await self.client.start_session() as session:
+            result = await session.with_transaction(apply)
+        if result is None:
+            self.cache.invalidate(from_id)
+            return None
+        sender, receiver = result
+        # Only cache once the transaction has committed
+        self.cache.put(sender)
+        self.cache.put(receiver)
+        return sender, receiver
+
+    async def _update(self, query: dict, update: dict) -> Optional[dict]:
+        doc = await self.collection.find_one_and_update(
+            query,
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            # Whatever we have cached disagreed with the database
+            self.cache.invalidate(query["user_id"])
+        else:
+            self.cache.put(doc)
+        return doc
+
+    def _trusted(self, conditions: Optional[dict]) -> Optional[dict]:
+        """The conditions a cached document may reject on; none if other processes write too."""
+        return conditions if self.cache.exclusive else None
+
+    @staticmethod
+    def _claimable(user: dict, field: str, cutoff: datetime, conditions: Optional[dict]) -> bool:
+        last = user.get(field)
+        if last is not None and last > cutoff:
+            return False
+        return all(user.get(key) == value for key, value in (conditions or {}).items())
+
+    @staticmethod
+    def _creditable(user: dict, key_field: str, key: str, conditions: Optional[dict]) -> bool:
+        value = user
+        for part in key_field.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if value == key:
+            return False
+        return all(user.get(field) == expected for field, expected in (conditions or {}).items())
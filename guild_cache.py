@@ -0,0 +1,28 @@
+from ttl_cache import TTLCache
+
+
+class GuildSettingsCache(TTLCache):
+    """LRU + TTL cache of server documents, keyed by guild id.
+
+    Documents are loaded lazily on first lookup and kept coherent by the
+    code paths that write server settings, which `set` the document they wrote.
+    Guilds with no server document are cached as an empty dict so that
+    unconfigured guilds don't hit the database on every message either.
+    """
+
+    def __init__(self, collection, max_size: int = 5000, ttl: float = 600.0):
+        super().__init__(max_size, ttl)
+        self.collection = collection
+
+    async def get(self, guild_id: int) -> dict:
+        """Return the server document for a guild, loading it if needed."""
+        doc = self._lookup(guild_id)
+        if doc is not None:
+            return doc
+        doc = await self.collection.find_one({"guild_id": guild_id}) or {}
+        self._store(guild_id, doc)
+        return doc
+
+    def set(self, guild_id: int, doc: dict):
+        """Replace the cached document after a full write."""
+        self._store(guild_id, doc)
@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateMany, UpdateOne
+
+INDEXES = [
+    IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+    IndexModel([("guild_id", ASCENDING), ("balance", DESCENDING), ("user_id", ASCENDING)]),
+    IndexModel([("user_id", ASCENDING)])  # a user's rows in every guild
+]
+
+
+class GuildMembers:
+    """Per-guild view of user balances, one document per (guild_id, user_id).
+
+    Commands report the balance they just wrote; rows are buffered in memory
+    (latest balance wins) and upserted in one unordered bulk_write by `flush`,
+    so tracking membership doesn't add a round trip to any command. A user's
+    latest balance is also written to their rows in every other guild, so no
+    server's leaderboard keeps the balance they had when last active there.
+    Rows carry the time their balance was recorded (`updated_at`), and a
+    write only replaces an older one, so processes flushing out of order
+    can't put a stale balance back.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._pending = set()  # (guild_id, user_id) rows to upsert
+        self._balances = {}  # user_id -> (latest balance, recorded at)
+
+    def record(self, guild_id: int, user_id: int, balance: int):
+        self._pending.add((guild_id, user_id))
+        self._balances[user_id] = (balance, datetime.utcnow())
+
+    def pending(self, guild_id: int) -> List[Tuple[int, int]]:
+        """(user_id, balance) for the guild's rows that haven't been flushed yet."""
+        return [(user_id, self._balances[user_id][0])
+                for row_guild, user_id in self._pending if row_guild == guild_id]
+
+    async def flush(self) -> int:
+        if not self._balances:
+            return 0
+        pending, self._pending = self._pending, set()
+        balances, self._balances = self._balances, {}
+        ops = [
+            # Creates missing rows only; balances are set by the guarded update below
+            UpdateOne(
+                {"guild_id": guild_id, "user_id": user_id},
+                {"$setOnInsert": {"balance": balances[user_id][0], "updated_at": balances[user_id][1]}},
+                upsert=True
+            )
+            for guild_id, user_id in pending
+        ] + [
+            UpdateMany(
+                {"user_id": user_id, "$or": [{"updated_at": {"$lt": at}}, {"updated_at": None}]},
+                {"$set": {"balance": balance, "updated_at": at}}
+            )
+            for user_id, (balance, at) in balances.items()
+        ]
+        try:
+            await self.collection.bulk_write(ops, ordered=False)
+        except BaseException:
+            # Put the rows back unless a newer balance was recorded meanwhile
+            self._pending |= pending
+            for user_id, latest in balances.items():
+                self._balances.setdefault(user_id, latest)
+            raise
+        return len(pending)
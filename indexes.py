@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+import guild_members
+import ledger
+import payouts
+import sweeper
+from leaderboard import SORT as LEADERBOARD_SORT
+
+# Every index the bot relies on, per collection
+INDEXES = {
+    "users": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel(LEADERBOARD_SORT),
+        IndexModel([("last_daily", ASCENDING)]),
+        IndexModel([("last_work", ASCENDING)]),
+        IndexModel([("job", ASCENDING), ("last_work", ASCENDING)]),  # inactivity sweep
+        IndexModel([("last_monthly", ASCENDING)]),
+        *payouts.INDEXES
+    ],
+    "servers": [
+        # Partial so legacy server_id-only documents don't collide on a null guild_id
+        IndexModel([("guild_id", ASCENDING)], unique=True,
+                   partialFilterExpression={"guild_id": {"$exists": True}})
+    ],
+    "guild_members": guild_members.INDEXES,
+    "ledger": ledger.INDEXES,
+    "ledger_snapshots": ledger.SNAPSHOT_INDEXES
+}
+
+# Queries on the command path that must be index-backed: (collection, filter, sort)
+HOT_QUERIES = [
+    ("users", {"user_id": 0}, None),
+    ("users", {}, LEADERBOARD_SORT),
+    ("users", sweeper.stale(datetime(2000, 1, 1)), None),
+    ("servers", {"guild_id": 0}, None),
+    ("guild_members", {"guild_id": 0, "user_id": 0}, None),
+    ("guild_members", {"guild_id": 0}, [("balance", DESCENDING), ("user_id", ASCENDING)]),
+    ("guild_members", {"user_id": 0}, None),
+    ("users", {"vRTEX_plus": True, "last_payout.weekly": {"$ne": ""}}, None),
+    ("ledger", {"user_id": 0}, None),
+    ("ledger_snapshots", {"user_id": 0}, None)
+]
+
+
+async def ensure_indexes(db, progress_interval: float = 5.0):
+    """Create any missing indexes, printing build progress while they run.
+
+    Raises if an index can't be built (e.g. duplicate user_id documents);
+    startup should stop rather than run the bot on collection scans.
+    """
+    reporter = asyncio.create_task(_report_progress(db, progress_interval))
+    try:
+        for name, models in INDEXES.items():
+            try:
+                created = await db[name].create_indexes(models)
+            except Exception as e:
+                hint = " (run `python migrations.py dedupe_users guild_ids` first)" if "duplicate key" in str(e) else ""
+                raise RuntimeError(f"Could not build indexes on {name}: {e}{hint}") from e
+            print(f"Indexes on {name}: {', '.join(created)}")
+    finally:
+        reporter.cancel()
+
+
+async def verify_query_plans(db):
+    """Explain each hot-path query and fail if any of them would scan a collection."""
+    unindexed = []
+    for name, query, sort in HOT_QUERIES:
+        cursor = db[name].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = await cursor.explain()
+        if _has_stage(plan.get("queryPlanner", {}).get("winningPlan", {}), "COLLSCAN"):
+            unindexed.append(f"{name}.find({query}, sort={sort})")
+    if unindexed:
+        raise RuntimeError("Unindexed hot-path queries:\n  " + "\n  ".join(unindexed))
+    print(f"Query plans OK: {len(HOT_QUERIES)} hot-path queries use indexes")
+
+
+async def _report_progress(db, interval: float):
+    # $currentOp needs clusterMonitor; stay quiet if the user doesn't have it
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            cursor = db.client.admin.aggregate([
+                {"$currentOp": {}},
+                {"$match": {"command.createIndexes": {"$exists": True}}}
+            ])
+            async for op in cursor:
+                progress = op.get("progress", {})
+                done, total = progress.get("done"), progress.get("total")
+                detail = f"{done}/{total}" if total else op.get("msg", "running")
+                print(f"Building indexes on {op['command']['createIndexes']}: {detail}")
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        return
+
+
+def _has_stage(plan, stage: str) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            return True
+        return any(_has_stage(value, stage) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_stage(value, stage) for value in plan)
+    return False
@@ -0,0 +1,119 @@
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from pymongo import ReturnDocument
+
+# The shop catalog; an item's id is its inventory key and must never be reused
+SHOP_ITEMS = [
+    {"id": 1, "name": "Bed", "price": 5000},
+    {"id": 2, "name": "TV", "price": 10000},
+    {"id": 3, "name": "House", "price": 50000},
+    {"id": 4, "name": "Food Pack", "price": 1000},
+    {"id": 5, "name": "Weapon", "price": 20000}
+]
+
+# Inventories are {item_id: count} maps. Documents written before that held a
+# list of item names, which is converted the first time a command touches it.
+LEGACY = {"inventory": {"$type": "array"}}
+COUNTED = {"inventory": {"$not": {"$type": "array"}}}
+
+
+def slot(item_id: int) -> str:
+    """Field path of an item's count (document keys are strings)."""
+    return f"inventory.{item_id}"
+
+
+class Catalog:
+    """Shop items indexed by id and by name, with the /shop listing prebuilt."""
+
+    def __init__(self, items: Iterable[dict]):
+        self.items = {item["id"]: item for item in items}
+        self._by_name = {item["name"].lower(): item for item in self.items.values()}
+        self.listing = "**Available Shop Items:**\n" + "".join(
+            f"{item['id']}. {item['name']} - {item['price']} 🪙\n" for item in self.items.values()
+        )
+
+    def get(self, item_id: int) -> Optional[dict]:
+        return self.items.get(item_id)
+
+    def find(self, name: str) -> Optional[dict]:
+        """Look an item up by name (case-insensitive) or by its id as text."""
+        name = name.strip()
+        if name.isdigit():
+            return self.get(int(name))
+        return self._by_name.get(name.lower())
+
+    def counts(self, names: Iterable[str]) -> Dict[str, int]:
+        """Convert a legacy list of item names to an inventory map; unknown names are dropped."""
+        counts = Counter()
+        for name in names:
+            item = self._by_name.get(str(name).lower())
+            if item is not None:
+                counts[str(item["id"])] += 1
+        return dict(counts)
+
+
+class Inventories:
+    """Buying and using items as single conditional $inc writes.
+
+    A purchase increments one counter and a use decrements it only while it
+    is above zero, so neither reads nor rewrites the rest of the inventory.
+    Like cooldowns, requests a cached document already rules out are
+    rejected without a round trip, as long as the user cache is exclusive.
+    """
+
+    def __init__(self, economy, repo, catalog: Catalog):
+        self.economy = economy
+        self.repo = repo
+        self.catalog = catalog
+
+    async def buy(self, user_id: int, item: dict) -> Optional[dict]:
+        """Charge the item's price and add one to its count; None if the user can't afford it."""
+        cached = self._counted(user_id)
+        if cached is not None and cached.get("balance", 0) < item["price"]:
+            return None
+
+        async def attempt():
+            return await self.economy.spend(
+                user_id, item["price"], inc={slot(item["id"]): 1}, conditions=COUNTED
+            )
+        doc = await attempt()
+        if doc is None and await self._upgrade(user_id):
+            doc = await attempt()
+        return doc
+
+    async def use(self, user_id: int, item: dict, count: int = 1) -> Optional[dict]:
+        """Take `count` of an item; None if the user doesn't hold that many."""
+        cached = self._counted(user_id)
+        if cached is not None and cached.get("inventory", {}).get(str(item["id"]), 0) < count:
+            return None
+        doc = await self.economy.consume(user_id, slot(item["id"]), count)
+        if doc is None and await self._upgrade(user_id):
+            doc = await self.economy.consume(user_id, slot(item["id"]), count)
+        return doc
+
+    def _counted(self, user_id: int) -> Optional[dict]:
+        """The cached document, if it can be trusted and its inventory is already a map."""
+        if not self.repo.cache.exclusive:
+            return None  # balance and counts may have grown in another process
+        cached = self.repo.cache.get(user_id)
+        if cached is None or isinstance(cached.get("inventory"), list):
+            return None
+        return cached
+
+    async def _upgrade(self, user_id: int) -> bool:
+        """Convert the user's list inventory in place; False if it was already counted."""
+        user = await self.repo.get_or_create(user_id)
+        if not isinstance(user.get("inventory"), list):
+            return False
+        doc = await self.repo.collection.find_one_and_update(
+            {"user_id": user_id, **LEGACY},
+            {"$set": {"inventory": self.catalog.counts(user["inventory"])}},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            # Converted concurrently (or the cached copy was stale)
+            self.repo.cache.invalidate(user_id)
+        else:
+            self.repo.cache.put(doc)
+        return True
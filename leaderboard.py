@@ -0,0 +1,167 @@
+import bisect
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Leaderboard order: balance descending, user_id ascending as the tie-break.
+# The same order is used for keyset pagination past the in-memory entries.
+SORT = [("balance", -1), ("user_id", 1)]
+
+Entry = Tuple[int, int]  # (user_id, balance)
+
+
+class TopN:
+    """Sorted top entries for one leaderboard scope.
+
+    Holds up to `capacity` users. `truncated` is True when there may be users
+    in the database ranking below the tail that aren't tracked here; in that
+    case a tracked user whose balance drops below the tail is dropped instead
+    of reordered, since their new rank can't be known from memory.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.truncated = False
+        self._keys = []  # sorted (-balance, user_id)
+        self._balances = {}  # user_id -> balance
+
+    def load(self, entries: List[Entry]):
+        self._keys = sorted((-balance, user_id) for user_id, balance in entries)
+        self._balances = {user_id: balance for user_id, balance in entries}
+        self.truncated = len(entries) >= self.capacity
+
+    def update(self, user_id: int, balance: int):
+        old = self._balances.pop(user_id, None)
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-old, user_id))]
+
+        key = (-balance, user_id)
+        if self.truncated and self._keys and key > self._keys[-1]:
+            return
+        bisect.insort(self._keys, key)
+        self._balances[user_id] = balance
+        if len(self._keys) > self.capacity:
+            _, dropped = self._keys.pop()
+            del self._balances[dropped]
+            self.truncated = True
+
+    def __len__(self):
+        return len(self._keys)
+
+    def entries(self, offset: int = 0, limit: Optional[int] = None) -> List[Entry]:
+        end = None if limit is None else offset + limit
+        return [(user_id, -neg) for neg, user_id in self._keys[offset:end]]
+
+    def entries_after(self, after: Entry, limit: int) -> List[Entry]:
+        user_id, balance = after
+        return self.entries(bisect.bisect_right(self._keys, (-balance, user_id)), limit)
+
+
+class Leaderboards:
+    """In-memory global and per-guild leaderboards.
+
+    The global board is seeded once at startup from the users collection;
+    guild boards are seeded from the guild members collection the first time
+    they are viewed and evicted LRU. Commands report every balance they write
+    through `record`, so reads never sort a collection; a balance change
+    reaches every loaded guild board the user has been seen on.
+    """
+
+    def __init__(self, collection, members, buffered=None, size: int = 10, capacity: int = 100,
+                 max_guilds: int = 1000):
+        self.collection = collection
+        self.members = members
+        self.buffered = buffered  # GuildMembers, whose unflushed rows a new guild board includes
+        self.size = size
+        self.capacity = capacity
+        self.max_guilds = max_guilds
+        self._global = TopN(capacity)
+        self._guilds = OrderedDict()  # guild_id -> TopN
+        self._memberships = {}  # user_id -> ids of loaded guild boards they were seen on
+
+    async def load(self):
+        """Seed the global board from the balance index."""
+        self._global.load(await self._query(None, None, self.capacity))
+
+    async def reload(self):
+        """Reseed after balances changed outside `record` (scheduled payouts, other processes)."""
+        await self.load()
+        self._guilds.clear()
+        self._memberships.clear()
+
+    def record(self, user_id: int, balance: int, guild_id: Optional[int] = None):
+        self._global.update(user_id, balance)
+        guild_ids = self._memberships.get(user_id)
+        if guild_id is not None and guild_id in self._guilds:
+            if guild_ids is None:
+                guild_ids = self._memberships[user_id] = set()
+            guild_ids.add(guild_id)
+        if not guild_ids:
+            return
+        for member_of in list(guild_ids):
+            board = self._guilds.get(member_of)
+            if board is None:
+                guild_ids.discard(member_of)  # board was evicted
+            else:
+                board.update(user_id, balance)
+        if not guild_ids:
+            del self._memberships[user_id]
+
+    async def top(self, guild_id: Optional[int] = None) -> List[Entry]:
+        board = await self._board(guild_id)
+        return board.entries(0, self.size)
+
+    async def page(self, after: Entry, guild_id: Optional[int] = None) -> List[Entry]:
+        """Return the `size` entries ranked after `after` (keyset pagination)."""
+        board = await self._board(guild_id)
+        entries = board.entries_after(after, self.size)
+        if len(entries) == self.size or not board.truncated:
+            return entries
+        # Past what's held in memory: continue from the index
+        last = entries[-1] if entries else after
+        more = await self._query(guild_id, last, self.size - len(entries))
+        return entries + more
+
+    async def _board(self, guild_id: Optional[int]) -> TopN:
+        if guild_id is None:
+            board = self._global
+        else:
+            board = self._guilds.get(guild_id)
+            if board is None:
+                board = TopN(self.capacity)
+                await self._seed(board, guild_id)
+                self._guilds[guild_id] = board
+                while len(self._guilds) > self.max_guilds:
+                    self._guilds.popitem(last=False)
+            self._guilds.move_to_end(guild_id)
+        if len(board) < self.size and board.truncated:
+            # Too many entries dropped out of the tracked range; reseed
+            await self._seed(board, guild_id)
+        return board
+
+    async def _seed(self, board: TopN, guild_id: Optional[int]):
+        entries = await self._query(guild_id, None, self.capacity)
+        board.load(entries)
+        if guild_id is None:
+            return
+        if self.buffered is not None:
+            # Balances recorded since the last flush aren't in the collection yet
+            unflushed = self.buffered.pending(guild_id)
+            for user_id, balance in unflushed:
+                board.update(user_id, balance)
+            entries = entries + unflushed
+        for user_id, _ in entries:
+            self._memberships.setdefault(user_id, set()).add(guild_id)
+
+    async def _query(self, guild_id: Optional[int], after: Optional[Entry], limit: int) -> List[Entry]:
+        if guild_id is None:
+            collection, query = self.collection, {}
+        else:
+            collection, query = self.members, {"guild_id": guild_id}
+        if after is not None:
+            user_id, balance = after
+            query = {**query, "$or": [
+                {"balance": {"$lt": balance}},
+                {"balance": balance, "user_id": {"$gt": user_id}}
+            ]}
+        cursor = collection.find(query, {"_id": 0, "user_id": 1, "balance": 1}).sort(SORT).limit(limit)
+        return [(doc["user_id"], doc.get("balance", 0)) async for doc in cursor]
@@ -0,0 +1,130 @@
+import asyncio
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
+
+INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("at", ASCENDING)]),
+    IndexModel([("at", ASCENDING)])
+]
+SNAPSHOT_INDEXES = [
+    IndexModel([("user_id", ASCENDING)], unique=True)
+]
+
+# Entry kinds whose amounts count as coins earned in /recap. "baseline" is the
+# pre-ledger total_earned counter carried over by `python migrations.py ledger_baseline`.
+EARNED_KINDS = ("daily", "work", "beg", "monthly", "weekly", "interest", "baseline")
+
+DUPLICATE_KEY = 11000
+
+
+class Ledger:
+    """Append-only history of balance changes, one entry per change.
+
+    Commands call `record` instead of writing; entries are buffered and
+    inserted in batches by `flush`. `compact` rolls entries older than the
+    retention window into one snapshot per user (per-kind counts and amount
+    sums) and deletes them in the same transaction, so every entry is in
+    exactly one of the snapshot or the ledger and `summary` only has to add
+    the user's snapshot to their recent tail.
+    """
+
+    def __init__(self, client, collection, snapshots, batch_size: int = 1000):
+        self.client = client
+        self.collection = collection
+        self.snapshots = snapshots
+        self.batch_size = batch_size
+        self._pending = []
+
+    def record(self, user_id: int, kind: str, amount: int = 0, **details):
+        self._pending.append({"user_id": user_id, "kind": kind, "amount": amount,
+                              "at": datetime.utcnow(), **details})
+
+    async def flush(self) -> int:
+        # Entries recorded while this runs wait for the next flush
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                # Entries keep the _id assigned on the first attempt, so a
+                # retried entry that did land shows up as a duplicate key
+                failed = {error["index"] for error in e.details.get("writeErrors", [])
+                          if error.get("code") != DUPLICATE_KEY}
+                self._requeue([entry for i, entry in enumerate(batch) if i in failed]
+                              + pending[start + self.batch_size:])
+                raise
+            except BaseException:
+                self._requeue(pending[start:])
+                raise
+        return len(pending)
+
+    def _requeue(self, entries: list):
+        self._pending[:0] = entries
+
+    async def summary(self, user_id: int) -> Tuple[Counter, Counter]:
+        """Per-kind entry counts and amount sums for a user, across their whole history."""
+        snapshot, tail = await asyncio.gather(
+            self.snapshots.find_one({"user_id": user_id}),
+            self.collection.aggregate([
+                {"$match": {"user_id": user_id}},
+                {"$group": {"_id": "$kind", "count": {"$sum": 1}, "amount": {"$sum": "$amount"}}}
+            ]).to_list(None)
+        )
+        counts, amounts = Counter(), Counter()
+        if snapshot:
+            counts.update(snapshot.get("counts", {}))
+            amounts.update(snapshot.get("amounts", {}))
+            baseline = snapshot.get("baseline", {})
+            counts.update(baseline.get("counts", {}))
+            amounts["baseline"] += baseline.get("earned", 0)
+        for group in tail:
+            counts[group["_id"]] += group["count"]
+            amounts[group["_id"]] += group["amount"]
+        # Entries still waiting for the next flush
+        for entry in self._pending:
+            if entry["user_id"] == user_id:
+                counts[entry["kind"]] += 1
+                amounts[entry["kind"]] += entry["amount"]
+        return counts, amounts
+
+    async def compact(self, retain: timedelta, batch_size: int = 500) -> int:
+        """Roll entries older than `retain` into per-user snapshots; returns users updated."""
+        cutoff = datetime.utcnow() - retain
+        cursor = self.collection.aggregate([
+            {"$match": {"at": {"$lte": cutoff}}},
+            {"$group": {"_id": {"user_id": "$user_id", "kind": "$kind"},
+                        "count": {"$sum": 1}, "amount": {"$sum": "$amount"}}},
+            # A user's groups must be contiguous: a batch deletes all of that user's old entries
+            {"$sort": {"_id.user_id": 1}}
+        ], allowDiskUse=True)
+        totals = defaultdict(dict)  # user_id -> $inc for their snapshot
+        updated = 0
+        async for group in cursor:
+            user_id, kind = group["_id"]["user_id"], group["_id"]["kind"]
+            if user_id not in totals and len(totals) >= batch_size:
+                updated += await self._roll_up(totals, cutoff)
+                totals = defaultdict(dict)
+            totals[user_id][f"counts.{kind}"] = group["count"]
+            totals[user_id][f"amounts.{kind}"] = group["amount"]
+        if totals:
+            updated += await self._roll_up(totals, cutoff)
+        return updated
+
+    async def _roll_up(self, totals: dict, cutoff: datetime) -> int:
+        ops = [
+            UpdateOne({"user_id": user_id}, {"$inc": inc, "$max": {"through": cutoff}}, upsert=True)
+            for user_id, inc in totals.items()
+        ]
+        # Snapshot increments and the deletes commit together or not at all
+        async with await self.client.start_session() as session:
+            async with session.start_transaction():
+                await self.snapshots.bulk_write(ops, ordered=False, session=session)
+                await self.collection.delete_many(
+                    {"user_id": {"$in": list(totals)}, "at": {"$lte": cutoff}}, session=session
+                )
+        return len(ops)
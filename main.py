@@ -4,10 +4,29 @@ import random
 from discord.ext import commands, tasks
 from discord import app_commands, Interaction
 import os
+import signal
 import asyncio
 import motor.motor_asyncio
+from pymongo import ReturnDocument
 from datetime import datetime, timedelta
-from web_server import keep_alive  # <-- only here
+from web_server import start_web_server
+from metrics import Registry
+from tracing import Tracer
+from guild_cache import GuildSettingsCache
+from user_repository import UserRepository
+from user_cache import UserCache
+from economy import EconomyOps
+from inventory import SHOP_ITEMS, Catalog, Inventories
+from leaderboard import Leaderboards
+from guild_members import GuildMembers
+from indexes import ensure_indexes, verify_query_plans
+from counters import StatCounters
+from ledger import EARNED_KINDS, Ledger
+from admission import AdmissionControl
+from command_sync import sync_if_changed
+from notifications import Notifier
+from sweeper import InactivitySweeper
+from payouts import WEEKLY_PAYOUT, BankInterest, PayoutEngine, WeeklyPayout, week_key
 
 # -------------------- CONFIG --------------------
 TOKEN = os.getenv("DISCORD_TOKEN")  # Discord Bot Token
@@ -18,85 +37,336 @@ TOPGG_LINK = os.getenv("TOPGG_LINK", "")
 
 DEFAULT_PREFIX = "!"  # Default text prefix for servers without custom prefix
 DEFAULT_CURRENCY = {"name": "coins", "symbol": "🪙"}
+GUILD_CACHE_SIZE = int(os.getenv("GUILD_CACHE_SIZE", "5000"))
+GUILD_CACHE_TTL = float(os.getenv("GUILD_CACHE_TTL", "600"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+STATS_FLUSH_SECONDS = float(os.getenv("STATS_FLUSH_SECONDS", "5"))
+# /recap aggregates a user's raw entries newer than this, so keep it short
+LEDGER_RETAIN_HOURS = float(os.getenv("LEDGER_RETAIN_HOURS", "24"))
+LEDGER_COMPACT_MINUTES = float(os.getenv("LEDGER_COMPACT_MINUTES", "15"))
+RATE_USER_PER_MINUTE = float(os.getenv("RATE_USER_PER_MINUTE", "20"))
+RATE_USER_BURST = float(os.getenv("RATE_USER_BURST", "5"))
+RATE_GUILD_PER_MINUTE = float(os.getenv("RATE_GUILD_PER_MINUTE", "600"))
+RATE_GUILD_BURST = float(os.getenv("RATE_GUILD_BURST", "60"))
+COMMAND_COSTS = {"beg": 2, "rob": 2}  # spam-prone commands drain buckets faster
+MONGO_EXPLAIN_CHECK = os.getenv("MONGO_EXPLAIN_CHECK", "0") == "1"  # fail startup on unindexed queries
+SWEEP_MINUTES = float(os.getenv("SWEEP_MINUTES", "10"))  # how often inactive workers are fired
+BANK_INTEREST_RATE = float(os.getenv("BANK_INTEREST_RATE", "0"))  # daily, e.g. 0.001; 0 = no interest
+BANK_INTEREST_CAP = int(os.getenv("BANK_INTEREST_CAP", "0"))  # max interest per user per day; 0 = no cap
+DM_WORKERS = int(os.getenv("DM_WORKERS", "4"))  # concurrent DM sends
+SLOW_COMMAND_MS = float(os.getenv("SLOW_COMMAND_MS", "0"))  # log commands slower than this; 0 = off
+WEB_PORT = int(os.getenv("PORT", "8080"))  # health/readiness/metrics server
+# Sharding: unset = let Discord recommend a count and run every shard here.
+# shard_launcher.py sets both to split the shards over several processes.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+SHARD_IDS = [int(x) for x in os.getenv("SHARD_IDS", "").split(",") if x.strip().isdigit()] or None
+# Sweeps, payouts and compaction run in one process only: the one with shard 0
+RUN_SCHEDULED_JOBS = SHARD_IDS is None or 0 in SHARD_IDS
+# With shards split over processes, each reseeds its boards to see the others' writes
+LEADERBOARD_RELOAD_SECONDS = float(os.getenv("LEADERBOARD_RELOAD_SECONDS", "60"))
+# Message events are only needed for prefix commands; off unless enabled
+PREFIX_COMMANDS = os.getenv("PREFIX_COMMANDS", "0") == "1"
+
+# -------------------- METRICS --------------------
+metrics = Registry()
+tracer = Tracer(metrics, slow_ms=SLOW_COMMAND_MS)
 
 # -------------------- MONGO DB --------------------
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
+if MONGO_URI and MONGO_URI.startswith("memory://"):
+    # In-process stand-in for local runs and bench.py; nothing is persisted
+    from memory_mongo import MemoryClient
+    client = MemoryClient(MONGO_URI)
+else:
+    client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
 db = client.vrtex_economy
 
-servers_collection = db.servers
-users_collection = db.users
+# Collections used by commands are traced so /metrics can count ops per command
+servers_collection = tracer.collection(db.servers)
+users_collection = tracer.collection(db.users)
+guild_members_collection = tracer.collection(db.guild_members)  # one doc per (guild_id, user_id)
+ledger_collection = tracer.collection(db.ledger)  # append-only balance history
+ledger_snapshots_collection = tracer.collection(db.ledger_snapshots)  # compacted per-user totals
+meta_collection = db.meta  # bot bookkeeping, e.g. the last synced command tree
+
+# Server settings are read on every message, so they're served from memory
+guild_cache = GuildSettingsCache(servers_collection, max_size=GUILD_CACHE_SIZE, ttl=GUILD_CACHE_TTL)
+# Active users' documents stay in memory, refreshed by every write below
+user_cache = UserCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, exclusive=SHARD_IDS is None)
+# All user reads/writes go through the repository (one upsert-and-return per call)
+user_repo = UserRepository(users_collection, user_cache)
+# Balance changes are conditional single writes; see economy.py
+economy = EconomyOps(client, users_collection, user_repo)
+# Shop catalog is built once; inventories are {item_id: count} maps changed with $inc
+catalog = Catalog(SHOP_ITEMS)
+inventories = Inventories(economy, user_repo, catalog)
+guild_members = GuildMembers(guild_members_collection)
+# Top balances are kept sorted in memory and updated as commands write
+leaderboards = Leaderboards(users_collection, guild_members_collection, guild_members)
+# commands_used is buffered and bulk-written
+stat_counters = StatCounters(users_collection, user_cache)
+# Every balance change is appended to the ledger in batches; /recap is built from it
+ledger = Ledger(client, ledger_collection, ledger_snapshots_collection)
+# Rate limits are enforced before a command touches the database
+admission = AdmissionControl(
+    RATE_USER_PER_MINUTE / 60, RATE_USER_BURST,
+    RATE_GUILD_PER_MINUTE / 60, RATE_GUILD_BURST,
+    costs=COMMAND_COSTS
+)
+
+def cache_stats():
+    for name, cache in (("guild", guild_cache), ("user", user_cache)):
+        yield {"cache": name}, cache.stats()
+
+metrics.gauge("vrtex_gateway_latency_seconds", "Discord gateway heartbeat latency per shard",
+              lambda: [({"shard": shard_id}, latency) for shard_id, latency in bot.latencies if latency == latency])
+metrics.gauge("vrtex_cache_hit_ratio", "Cache hit ratio since startup",
+              lambda: [(labels, stats["hit_rate"]) for labels, stats in cache_stats()])
+metrics.gauge("vrtex_cache_hits", "Cache hits since startup",
+              lambda: [(labels, stats["hits"]) for labels, stats in cache_stats()])
+metrics.gauge("vrtex_cache_misses", "Cache misses since startup",
+              lambda: [(labels, stats["misses"]) for labels, stats in cache_stats()])
+metrics.gauge("vrtex_admission_commands", "Commands admitted/rejected by rate limiting since startup",
+              lambda: [({"result": result}, admission.stats()[result]) for result in ("admitted", "rejected")])
 
 # -------------------- HELPER FUNCTIONS --------------------
 async def get_server_prefix(guild_id: int):
     """Return the prefix for a server; default if not set."""
-    server = await servers_collection.find_one({"guild_id": guild_id})
-    if server and server.get("custom_prefix"):
+    server = await guild_cache.get(guild_id)
+    if server.get("custom_prefix"):
         return server["custom_prefix"]
     return DEFAULT_PREFIX
 
 async def get_currency_settings(guild_id: int):
     """Return currency name & symbol for a server."""
-    server = await servers_collection.find_one({"guild_id": guild_id})
-    if server and server.get("currency"):
-        return server["currency"]
+    server = await guild_cache.get(guild_id)
+    if server.get("currency"):
+        return {**DEFAULT_CURRENCY, **server["currency"]}
     return DEFAULT_CURRENCY
 
-async def setup_user(user_id: int):
-    """Ensure a user exists in DB."""
-    user = await users_collection.find_one({"user_id": user_id})
-    if not user:
-        await users_collection.insert_one({
-            "user_id": user_id,
-            "balance": 0,
-            "bank": 0,
-            "work_streak": 0,
-            "job": None,
-            "job_level": 1,
-            "commands_used": 0,
-            "times_worked": 0,
-            "times_bought": 0,
-            "times_robbed": 0,
-            "times_robbed_others": 0,
-            "times_fired": 0
-        })
+async def get_prefix(bot, message):
+    """Prefix callable for commands.Bot; DMs use the default prefix."""
+    if message.guild is None:
+        return DEFAULT_PREFIX
+    return await get_server_prefix(message.guild.id)
+
+def record_balances(interaction: Interaction, *users: dict):
+    """Feed user documents returned by a balance write into the leaderboards."""
+    guild_id = interaction.guild.id if interaction.guild else None
+    for user in users:
+        leaderboards.record(user["user_id"], user["balance"], guild_id)
+        if guild_id is not None:
+            guild_members.record(guild_id, user["user_id"], user["balance"])
+
+def format_leaderboard(title: str, entries: list, start: int = 1) -> str:
+    # Mentions are rendered by the client, so no member has to be cached or fetched
+    msg = f"**{title}:**\n"
+    for i, (user_id, balance) in enumerate(entries, start):
+        msg += f"{i}. <@{user_id}> - {balance} 🪙\n"
+    return msg
 
 # -------------------- BOT SETUP --------------------
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix=DEFAULT_PREFIX, intents=intents)
+class EconomyTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        """Shed load before any command handler runs."""
+        command = interaction.command.qualified_name if interaction.command else "unknown"
+        guild_id = interaction.guild.id if interaction.guild else None
+        if admission.admit(interaction.user.id, guild_id, command):
+            tracer.start(interaction, command)
+            return True
+        tracer.reject(command)
+        await interaction.response.send_message("Slow down! You're using commands too quickly.", ephemeral=True)
+        return False
+
+    async def on_error(self, interaction: Interaction, error):
+        tracer.finish(interaction, "error")
+        await super().on_error(interaction, error)
+
+class EconomyBot(commands.AutoShardedBot):
+    web_runner = None
+
+    async def close(self):
+        # Buffered writes and queued DMs must go out before the process exits
+        await flush_pending_writes()
+        await notifier.stop()
+        if self.web_runner is not None:
+            await self.web_runner.cleanup()
+        await super().close()
+
+# Slash commands need no privileged intents, so by default no messages are streamed.
+# Members and presences aren't requested or cached, so memory doesn't grow with guild size.
+intents = discord.Intents.none()
+intents.guilds = True
+intents.guild_messages = PREFIX_COMMANDS
+intents.dm_messages = PREFIX_COMMANDS
+intents.message_content = PREFIX_COMMANDS
+bot = EconomyBot(
+    command_prefix=get_prefix,
+    intents=intents,
+    tree_cls=EconomyTree,
+    shard_count=SHARD_COUNT,
+    shard_ids=SHARD_IDS,
+    member_cache_flags=discord.MemberCacheFlags.none(),
+    chunk_guilds_at_startup=False,
+    max_messages=None
+)
+# DMs are sent by background workers so commands never wait on them
+notifier = Notifier(bot, workers=DM_WORKERS)
+metrics.gauge("vrtex_notifications", "DM notifications by state (pending now, others since startup)",
+              lambda: [({"state": state}, value) for state, value in notifier.stats().items()])
+# Firing for missed work happens in a background sweep, not on /work
+sweeper = InactivitySweeper(users_collection, user_cache, ledger, notifier)
+# Weekly VRTEX+ payouts and bank interest are paid in bulk; see payouts.py
+payout_engine = PayoutEngine(users_collection, user_cache, ledger, guild_members_collection)
+scheduled_payouts = [WeeklyPayout()]
+if BANK_INTEREST_RATE > 0:
+    scheduled_payouts.append(BankInterest(BANK_INTEREST_RATE, BANK_INTEREST_CAP))
 
 # -------------------- EVENTS --------------------
 @bot.event
-async def on_ready():
-    print(f"Logged in as {bot.user}")
+async def setup_hook():
+    # bot.run only closes cleanly on Ctrl+C; containers and systemd stop with SIGTERM
     try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} slash commands")
-    except Exception as e:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+    except NotImplementedError:
+        pass  # no signal handlers on Windows event loops
+    bot.web_runner = await start_web_server(bot, db, metrics, port=WEB_PORT)
+    notifier.start()
+    await ensure_indexes(db)
+    if MONGO_EXPLAIN_CHECK:
+        await verify_query_plans(db)
+    await leaderboards.load()
+    flush_guild_members.start()
+    flush_stats.start()
+    flush_ledger.start()
+    if SHARD_IDS is not None:
+        reload_leaderboards.start()
+    if RUN_SCHEDULED_JOBS:
+        compact_ledger.start()
+        sweep_inactive.start()
+        run_payouts.start()
+    # Runs once per process, not on every gateway reconnect like on_ready
+    try:
+        await sync_if_changed(bot, meta_collection)
+    except discord.HTTPException as e:
         print(f"Error syncing commands: {e}")
 
+@bot.event
+async def on_ready():
+    print(f"Logged in as {bot.user}")
+
+@bot.event
+async def on_app_command_completion(interaction: Interaction, command):
+    tracer.finish(interaction, "ok")
+    stat_counters.incr(interaction.user.id, commands_used=1)
+
 @bot.event
 async def on_guild_join(guild):
     """Setup default server settings on join."""
     existing = await servers_collection.find_one({"guild_id": guild.id})
     if not existing:
-        await servers_collection.insert_one({
+        server = {
             "guild_id": guild.id,
             "custom_prefix": None,
             "currency": DEFAULT_CURRENCY,
             "vrt_ex_server_plus": False
-        })
+        }
+        await servers_collection.insert_one(server)
+        guild_cache.set(guild.id, server)
+    else:
+        guild_cache.set(guild.id, existing)
 
 @bot.event
 async def on_message(message):
     if message.author.bot:
         return
 
-    prefix = await get_server_prefix(message.guild.id)
-    if message.content.startswith(prefix):
-        ctx = await bot.get_context(message)
-        await bot.invoke(ctx)
+    # Prefix resolution goes through get_prefix, which is served from guild_cache
     await bot.process_commands(message)
 
+# -------------------- BACKGROUND TASKS --------------------
+@tasks.loop(seconds=10)
+async def flush_guild_members():
+    """Write buffered guild membership balances in one bulk_write."""
+    try:
+        await guild_members.flush()
+    except Exception as e:
+        print(f"Error flushing guild members: {e}")
+
+@tasks.loop(seconds=STATS_FLUSH_SECONDS)
+async def flush_stats():
+    """Apply coalesced stat counter increments in one unordered bulk_write."""
+    try:
+        await stat_counters.flush()
+    except Exception as e:
+        print(f"Error flushing stat counters: {e}")
+
+@tasks.loop(seconds=LEADERBOARD_RELOAD_SECONDS)
+async def reload_leaderboards():
+    """Reseed the in-memory boards, which otherwise only see this process's writes."""
+    try:
+        await leaderboards.reload()
+    except Exception as e:
+        print(f"Error reloading leaderboards: {e}")
+
+@tasks.loop(seconds=STATS_FLUSH_SECONDS)
+async def flush_ledger():
+    """Insert buffered ledger entries in batches."""
+    try:
+        await ledger.flush()
+    except Exception as e:
+        print(f"Error flushing ledger: {e}")
+
+@tasks.loop(minutes=LEDGER_COMPACT_MINUTES)
+async def compact_ledger():
+    """Roll ledger entries past the retention window into per-user snapshots."""
+    try:
+        users = await ledger.compact(timedelta(hours=LEDGER_RETAIN_HOURS))
+        if users:
+            print(f"Compacted ledger entries for {users} users")
+    except Exception as e:
+        print(f"Error compacting ledger: {e}")
+
+@tasks.loop(minutes=SWEEP_MINUTES)
+async def sweep_inactive():
+    """Fire users who missed work for 2 days and reset their streaks."""
+    try:
+        with tracer.span("sweep_inactive"):
+            fired = await sweeper.sweep()
+        if fired:
+            print(f"Fired {fired} inactive users")
+    except Exception as e:
+        print(f"Error sweeping inactive users: {e}")
+
+@tasks.loop(hours=1)
+async def run_payouts():
+    """Pay whatever the current week/day still owes; users already paid are skipped."""
+    for payout in scheduled_payouts:
+        try:
+            with tracer.span(f"payout_{payout.kind}"):
+                totals = await payout_engine.run(payout)
+            if totals["users"]:
+                print(f"Paid {totals['amount']} coins of {payout.kind} ({totals['key']}) to {totals['users']} users")
+                if payout.target == "balance":
+                    await leaderboards.reload()
+        except Exception as e:
+            print(f"Error running {payout.kind} payout: {e}")
+
+async def flush_pending_writes():
+    """Stop the flush loops and write out whatever is still buffered."""
+    loops = (flush_guild_members, flush_stats, flush_ledger, reload_leaderboards,
+             compact_ledger, sweep_inactive, run_payouts)
+    running = [loop.get_task() for loop in loops if loop.get_task() is not None]
+    for loop in loops:
+        loop.cancel()
+    # A flush interrupted mid-write puts its batch back; wait for that before the final flush
+    await asyncio.gather(*running, return_exceptions=True)
+    for buffer in (guild_members, stat_counters, ledger):
+        try:
+            await buffer.flush()
+        except Exception as e:
+            print(f"Error flushing on shutdown: {e}")
+
 # main.py - Quarter 2 (Economy Core)
 
 # -------------------- JOBS & WORK --------------------
@@ -110,46 +380,42 @@ jobs_list = {
 
 @bot.tree.command(name="work", description="Work your job to earn coins")
 async def work(interaction: Interaction):
-    await setup_user(interaction.user.id)
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
+    user_data = await user_repo.get_or_create(interaction.user.id)
     
     if not user_data.get("job"):
         await interaction.response.send_message("You don't have a job! Use `/job` to get one.", ephemeral=True)
         return
     
+    # Missing work for 2 days costs you your job; see sweep_inactive
     last_work = user_data.get("last_work")
-    now = datetime.utcnow()
-    if last_work:
-        delta = now - last_work
-        if delta < timedelta(hours=1):
-            await interaction.response.send_message("You can only work once per hour!", ephemeral=True)
-            return
+    if last_work and datetime.utcnow() - last_work < timedelta(hours=1):
+        await interaction.response.send_message("You can only work once per hour!", ephemeral=True)
+        return
     
     # Give coins
     earned = 500 * user_data["job_level"]
-    new_balance = user_data["balance"] + earned
-    streak = user_data.get("work_streak", 0) + 1
-    times_worked = user_data.get("times_worked", 0) + 1
-    
-    await users_collection.update_one(
-        {"user_id": interaction.user.id},
-        {"$set": {"balance": new_balance, "work_streak": streak, "last_work": now, "times_worked": times_worked}}
+    # Only pays if the sweep hasn't fired them since user_data was read
+    claimed = await economy.claim(
+        interaction.user.id, "last_work", timedelta(hours=1), earned,
+        inc={"work_streak": 1}, conditions={"job": user_data["job"]}
     )
+    if claimed is None:
+        user_data = await user_repo.get_or_create(interaction.user.id)
+        if not user_data.get("job"):
+            await interaction.response.send_message("You missed work for too long and were fired! Use `/job` to get a new one.", ephemeral=True)
+        else:
+            await interaction.response.send_message("You can only work once per hour!", ephemeral=True)
+        return
+    user_data = claimed
+    record_balances(interaction, user_data)
+    ledger.record(interaction.user.id, "work", earned)
+    streak = user_data["work_streak"]
     
     await interaction.response.send_message(f"You worked as a {jobs_list[user_data['job']]} and earned {earned} 🪙!\nYour current streak: {streak}")
 
-    # Firing logic: if streak missed 2 times in a row for 3 days
-    if streak < 3:
-        await interaction.user.send("You missed work streak requirements. You have been fired due to inactivity!")
-        await users_collection.update_one(
-            {"user_id": interaction.user.id},
-            {"$set": {"job": None, "work_streak": 0}, "$inc": {"times_fired": 1}}
-        )
-
 @bot.tree.command(name="job", description="Get or check your job")
 async def job(interaction: Interaction):
-    await setup_user(interaction.user.id)
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
+    user_data = await user_repo.get_or_create(interaction.user.id)
     
     if user_data.get("job"):
         job_name = jobs_list[user_data["job"]]
@@ -159,71 +425,41 @@ async def job(interaction: Interaction):
     # Assign first job randomly
     import random
     new_job = random.choice(list(jobs_list.keys()))
-    await users_collection.update_one({"user_id": interaction.user.id}, {"$set": {"job": new_job}})
+    # hired_at gives a new hire (or someone fired before) a full grace period; see sweeper.stale
+    await user_repo.set_fields(interaction.user.id, job=new_job, hired_at=datetime.utcnow())
     await interaction.response.send_message(f"You have been assigned the job: {jobs_list[new_job]}")
 
 # -------------------- MONTHLY --------------------
 @bot.tree.command(name="monthly", description="Get your monthly payout (30000 coins)")
 async def monthly(interaction: Interaction):
-    await setup_user(interaction.user.id)
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
-    
-    last_monthly = user_data.get("last_monthly")
-    now = datetime.utcnow()
-    if last_monthly:
-        delta = now - last_monthly
-        if delta < timedelta(days=30):
-            await interaction.response.send_message("You can only claim monthly once every 30 days!", ephemeral=True)
-            return
-    
-    new_balance = user_data["balance"] + 30000
-    await users_collection.update_one(
-        {"user_id": interaction.user.id},
-        {"$set": {"balance": new_balance, "last_monthly": now}}
-    )
+    claimed = await economy.claim(interaction.user.id, "last_monthly", timedelta(days=30), 30000)
+    if not claimed:
+        await interaction.response.send_message("You can only claim monthly once every 30 days!", ephemeral=True)
+        return
+    record_balances(interaction, claimed)
+    ledger.record(interaction.user.id, "monthly", 30000)
     await interaction.response.send_message("You received your monthly payout of 30000 🪙!")
 
 # -------------------- SHOP & BUY --------------------
-shop_items = {
-    1: {"name": "Bed", "price": 5000},
-    2: {"name": "TV", "price": 10000},
-    3: {"name": "House", "price": 50000},
-    4: {"name": "Food Pack", "price": 1000},
-    5: {"name": "Weapon", "price": 20000}
-}
-
 @bot.tree.command(name="shop", description="View shop items")
 async def shop(interaction: Interaction):
-    msg = "**Available Shop Items:**\n"
-    for item_id, item in shop_items.items():
-        msg += f"{item_id}. {item['name']} - {item['price']} 🪙\n"
-    await interaction.response.send_message(msg)
+    await interaction.response.send_message(catalog.listing)
 
 @bot.tree.command(name="buy", description="Buy an item from the shop")
 @app_commands.describe(item_id="Enter the item number from /shop")
 async def buy(interaction: Interaction, item_id: int):
-    await setup_user(interaction.user.id)
-    if item_id not in shop_items:
+    item = catalog.get(item_id)
+    if item is None:
         await interaction.response.send_message("Invalid item ID!", ephemeral=True)
         return
     
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
-    item = shop_items[item_id]
-    
-    if user_data["balance"] < item["price"]:
+    # Deduct coins and add one to the item's count (only if the balance covers the price)
+    user_data = await inventories.buy(interaction.user.id, item)
+    if user_data is None:
         await interaction.response.send_message("You don't have enough coins!", ephemeral=True)
         return
-    
-    # Deduct coins and add to inventory
-    new_balance = user_data["balance"] - item["price"]
-    inventory = user_data.get("inventory", [])
-    inventory.append(item["name"])
-    times_bought = user_data.get("times_bought", 0) + 1
-    
-    await users_collection.update_one(
-        {"user_id": interaction.user.id},
-        {"$set": {"balance": new_balance, "inventory": inventory, "times_bought": times_bought}}
-    )
+    record_balances(interaction, user_data)
+    ledger.record(interaction.user.id, "buy", -item["price"], item_id=item["id"])
     
     await interaction.response.send_message(f"You bought **{item['name']}** for {item['price']} 🪙!")
 
@@ -231,45 +467,36 @@ async def buy(interaction: Interaction, item_id: int):
 @bot.tree.command(name="use", description="Use an item from your inventory")
 @app_commands.describe(item_name="Name of the item to use")
 async def use(interaction: Interaction, item_name: str):
-    await setup_user(interaction.user.id)
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
-    inventory = user_data.get("inventory", [])
-    
-    if item_name not in inventory:
+    item = catalog.find(item_name)
+    # Decrements the item's count only while it's above zero
+    if item is None or await inventories.use(interaction.user.id, item) is None:
         await interaction.response.send_message("You don't own this item!", ephemeral=True)
         return
     
-    inventory.remove(item_name)
-    await users_collection.update_one({"user_id": interaction.user.id}, {"$set": {"inventory": inventory}})
-    await interaction.response.send_message(f"You used **{item_name}**!")
+    await interaction.response.send_message(f"You used **{item['name']}**!")
 
 # main.py - Quarter 3 (Leaderboards, Settings, Weekly)
 
 # -------------------- WEEKLY PAYOUT (VRTEX+ ONLY) --------------------
 @bot.tree.command(name="weekly", description="Get your weekly payout (only for VRTEX+ users)")
 async def weekly(interaction: Interaction):
-    await setup_user(interaction.user.id)
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
-    
-    # Check if user has VRTEX+
-    if not user_data.get("vRTEX_plus", False):
-        await interaction.response.send_message("This command is only available for VRTEX+ users!", ephemeral=True)
+    payout = WEEKLY_PAYOUT
+    # Same once-per-ISO-week key as the automatic payout, so the two never both pay
+    claimed = await economy.credit_once(
+        interaction.user.id, "last_payout.weekly", week_key(datetime.utcnow()), payout,
+        conditions={"vRTEX_plus": True}
+    )
+    if not claimed:
+        # Only read the user back to explain why the claim didn't go through
+        user_data = await user_repo.get_or_create(interaction.user.id)
+        if not user_data.get("vRTEX_plus", False):
+            await interaction.response.send_message("This command is only available for VRTEX+ users!", ephemeral=True)
+        else:
+            await interaction.response.send_message("You've already received this week's payout!", ephemeral=True)
         return
+    record_balances(interaction, claimed)
+    ledger.record(interaction.user.id, "weekly", payout)
     
-    last_weekly = user_data.get("last_weekly")
-    now = datetime.utcnow()
-    if last_weekly:
-        delta = now - last_weekly
-        if delta < timedelta(days=7):
-            await interaction.response.send_message("You can only claim weekly once every 7 days!", ephemeral=True)
-            return
-    
-    payout = 7000
-    new_balance = user_data["balance"] + payout
-    await users_collection.update_one(
-        {"user_id": interaction.user.id},
-        {"$set": {"balance": new_balance, "last_weekly": now}}
-    )
     await interaction.response.send_message(f"You received your weekly payout of {payout} 🪙!")
 
 # -------------------- SETTINGS COMMAND --------------------
@@ -284,150 +511,119 @@ async def settings(interaction: Interaction, prefix: str = None, currency_name:
         await interaction.response.send_message("Only admins can change settings!", ephemeral=True)
         return
     
-    server_id = interaction.guild.id
-    server_data = await servers_collection.find_one({"server_id": server_id}) or {}
+    guild_id = interaction.guild.id
+    server_data = await guild_cache.get(guild_id)
 
     update_dict = {}
     
     # Custom prefix only for VRTEX SERVER+
     if prefix:
-        if server_data.get("vRTEX_server_plus", False):
-            update_dict["prefix"] = prefix
+        if server_data.get("vrt_ex_server_plus", False):
+            update_dict["custom_prefix"] = prefix
         else:
             await interaction.response.send_message("Only VRTEX SERVER+ servers can set a custom prefix.", ephemeral=True)
             return
     
     if currency_name:
-        update_dict["currency_name"] = currency_name
+        update_dict["currency.name"] = currency_name
     if currency_symbol:
-        update_dict["currency_symbol"] = currency_symbol
+        update_dict["currency.symbol"] = currency_symbol
     
     if update_dict:
-        await servers_collection.update_one({"server_id": server_id}, {"$set": update_dict}, upsert=True)
+        server_data = await servers_collection.find_one_and_update(
+            {"guild_id": guild_id},
+            {"$set": update_dict},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        guild_cache.set(guild_id, server_data)
         await interaction.response.send_message("Server settings updated successfully!")
     else:
         await interaction.response.send_message("No valid changes provided.", ephemeral=True)
 
-# -------------------- SERVER LEADERBOARD --------------------
+# -------------------- LEADERBOARDS --------------------
+class LeaderboardView(discord.ui.View):
+    """Next button that pages past the shown entries by keyset (balance, user_id)."""
+
+    def __init__(self, title: str, entries: list, guild=None):
+        super().__init__(timeout=120)
+        self.title = title
+        self.guild = guild
+        self.rank = len(entries)
+        self.last = entries[-1] if entries else None
+        if len(entries) < leaderboards.size:
+            self.next_page.disabled = True
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: Interaction, button: discord.ui.Button):
+        guild_id = self.guild.id if self.guild else None
+        entries = await leaderboards.page(self.last, guild_id=guild_id)
+        if len(entries) < leaderboards.size:
+            button.disabled = True
+        if not entries:
+            await interaction.response.edit_message(view=self)
+            return
+        msg = format_leaderboard(self.title, entries, self.rank + 1)
+        self.rank += len(entries)
+        self.last = entries[-1]
+        await interaction.response.edit_message(content=msg, view=self, allowed_mentions=discord.AllowedMentions.none())
+
 @bot.tree.command(name="server_leaderboard", description="View server leaderboard")
 async def server_leaderboard(interaction: Interaction):
-    server_id = interaction.guild.id
-    server_users = await users_collection.find({"server_id": server_id}).to_list(length=100)
-leaderboard = sorted(server_users, key=lambda u: u.get("balance", 0), reverse=True)[:10]
-    
-    msg = "**Server Leaderboard:**\n"
-    for i, user in enumerate(leaderboard, 1):
-        member = interaction.guild.get_member(user["user_id"])
-        name = member.mention if member else f"UserID {user['user_id']}"
-        msg += f"{i}. {name} - {user['balance']} 🪙\n"
-    
-    await interaction.response.send_message(msg)
+    entries = await leaderboards.top(interaction.guild.id)
+    msg = format_leaderboard("Server Leaderboard", entries)
+    await interaction.response.send_message(msg, view=LeaderboardView("Server Leaderboard", entries, interaction.guild),
+                                            allowed_mentions=discord.AllowedMentions.none())
 
-# -------------------- GLOBAL LEADERBOARD --------------------
 @bot.tree.command(name="global_leaderboard", description="View global leaderboard")
 async def global_leaderboard(interaction: Interaction):
-    global_users = await users_collection.find().to_list(length=1000)
-    leaderboard = sorted(global_users, key=lambda u: u.get("balance", 0), reverse=True)[:10]
-
-    
-    msg = "**Global Leaderboard:**\n"
-    for i, user in enumerate(leaderboard, 1):
-        msg += f"{i}. <@{user['user_id']}> - {user['balance']} 🪙\n"
-    
-    await interaction.response.send_message(msg)
+    entries = await leaderboards.top()
+    msg = format_leaderboard("Global Leaderboard", entries)
+    await interaction.response.send_message(msg, view=LeaderboardView("Global Leaderboard", entries),
+                                            allowed_mentions=discord.AllowedMentions.none())
 
 # main.py - Quarter 4 (Economy Actions, Recap, Daily/Crime/Robbery/etc.)
 
 # -------------------- DAILY PAYOUT --------------------
 @bot.tree.command(name="daily", description="Claim your daily coins")
 async def daily(interaction: Interaction):
-    await setup_user(interaction.user.id)
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
-    now = datetime.utcnow()
-    
-    last_daily = user_data.get("last_daily")
-    if last_daily and (now - last_daily).total_seconds() < 86400:  # 24h
+    payout = 1000
+    claimed = await economy.claim(interaction.user.id, "last_daily", timedelta(hours=24), payout)
+    if not claimed:
         await interaction.response.send_message("You can only claim daily once every 24 hours!", ephemeral=True)
         return
+    record_balances(interaction, claimed)
+    ledger.record(interaction.user.id, "daily", payout)
 
-    payout = 1000
-    new_balance = user_data["balance"] + payout
-    await users_collection.update_one(
-        {"user_id": interaction.user.id},
-        {"$set": {"balance": new_balance, "last_daily": now},
-         "$inc": {"daily_claims": 1, "total_earned": payout}}
-    )
     await interaction.response.send_message(f"You claimed your daily {payout} 🪙!")
 
-# -------------------- WORK / JOB --------------------
-@bot.tree.command(name="work", description="Do your work shift")
-async def work(interaction: Interaction):
-    await setup_user(interaction.user.id)
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
-    
-    now = datetime.utcnow()
-    last_work = user_data.get("last_work")
-    
-    if last_work and (now - last_work).total_seconds() < 43200:  # 12h cooldown
-        await interaction.response.send_message("You already worked recently. Wait before working again.", ephemeral=True)
-        return
-    
-    # Job streaks
-    streak = user_data.get("job_streak", 0)
-    if last_work and (now - last_work).total_seconds() > 172800:  # >2 days, reset streak
-        streak = 0
-        # Send DM about firing if missed work twice in a row
-        try:
-            await interaction.user.send("You missed work for 2 days. You are fired from your job!")
-        except:
-            pass
-
-    earnings = 2000 + (streak * 200)
-    new_balance = user_data["balance"] + earnings
-    await users_collection.update_one(
-        {"user_id": interaction.user.id},
-        {"$set": {"balance": new_balance, "last_work": now, "job_streak": streak + 1},
-         "$inc": {"total_worked": 1, "total_earned": earnings}}
-    )
-    await interaction.response.send_message(f"You worked your shift and earned {earnings} 🪙! Streak: {streak+1}")
-
 # -------------------- DEPOSIT & WITHDRAW --------------------
 @bot.tree.command(name="deposit", description="Deposit coins into your bank")
 @app_commands.describe(amount="Amount to deposit")
 async def deposit(interaction: Interaction, amount: int):
-    await setup_user(interaction.user.id)
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
+    if amount <= 0:
+        await interaction.response.send_message("Amount must be positive!", ephemeral=True)
+        return
     
-    if amount > user_data["balance"]:
+    user_data = await economy.move(interaction.user.id, "balance", "bank", amount)
+    if not user_data:
         await interaction.response.send_message("You don't have enough coins!", ephemeral=True)
         return
-    
-    new_balance = user_data["balance"] - amount
-    new_bank = user_data.get("bank", 0) + amount
-    await users_collection.update_one(
-        {"user_id": interaction.user.id},
-        {"$set": {"balance": new_balance, "bank": new_bank}}
-    )
+    record_balances(interaction, user_data)
     await interaction.response.send_message(f"Deposited {amount} 🪙 to your bank!")
 
 @bot.tree.command(name="withdraw", description="Withdraw coins from your bank")
 @app_commands.describe(amount="Amount to withdraw")
 async def withdraw(interaction: Interaction, amount: int):
-    await setup_user(interaction.user.id)
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
-
+    if amount <= 0:
+        await interaction.response.send_message("Amount must be positive!", ephemeral=True)
+        return
     
-    bank_amount = user_data.get("bank", 0)
-    if amount > bank_amount:
+    user_data = await economy.move(interaction.user.id, "bank", "balance", amount)
+    if not user_data:
         await interaction.response.send_message("Not enough coins in your bank!", ephemeral=True)
         return
-    
-    new_balance = user_data["balance"] + amount
-    new_bank = bank_amount - amount
-    await users_collection.update_one(
-        {"user_id": interaction.user.id},
-        {"$set": {"balance": new_balance, "bank": new_bank}}
-    )
+    record_balances(interaction, user_data)
     await interaction.response.send_message(f"Withdrew {amount} 🪙 from your bank!")
 
 # -------------------- ROB / CRIME / BEG --------------------
@@ -438,42 +634,47 @@ async def rob(interaction: Interaction, user: discord.Member):
         await interaction.response.send_message("Invalid target!", ephemeral=True)
         return
     
-    await setup_user(interaction.user.id)
-    await setup_user(user.id)
-    
     success = random.choice([True, False])
     amount = random.randint(100, 2000)
     
     if success:
-        await users_collection.update_one({"user_id": interaction.user.id}, {"$inc": {"balance": amount, "total_robbed": 1}})
-        await users_collection.update_one({"user_id": user.id}, {"$inc": {"balance": -amount, "total_got_robbed": 1}})
+        # Victim is debited and robber credited in one transaction; never below zero
+        robbed = await economy.transfer(user.id, interaction.user.id, amount)
+        if robbed is None:
+            await interaction.response.send_message(f"{user.mention} doesn't have {amount} 🪙 to steal!")
+            return
+        record_balances(interaction, *robbed)
+        ledger.record(interaction.user.id, "rob", amount, victim_id=user.id)
+        ledger.record(user.id, "robbed", -amount, robber_id=interaction.user.id)
         await interaction.response.send_message(f"You successfully robbed {amount} 🪙 from {user.mention}!")
     else:
         await interaction.response.send_message("Your robbery attempt failed!")
 
 @bot.tree.command(name="beg", description="Beg for coins")
 async def beg(interaction: Interaction):
-    await setup_user(interaction.user.id)
     amount = random.randint(50, 500)
-    await users_collection.update_one(
-        {"user_id": interaction.user.id},
-        {"$inc": {"balance": amount, "total_earned": amount}}
-    )
+    user_data = await user_repo.increment(interaction.user.id, balance=amount)
+    record_balances(interaction, user_data)
+    ledger.record(interaction.user.id, "beg", amount)
     await interaction.response.send_message(f"You begged and received {amount} 🪙!")
 
 # -------------------- RECAP COMMAND --------------------
 @bot.tree.command(name="recap", description="Show your stats in VRTEX Economy")
 async def recap(interaction: Interaction):
-    await setup_user(interaction.user.id)
-    user_data = await users_collection.find_one({"user_id": interaction.user.id})
+    # Ledger snapshot + recent entries, read alongside the user document
+    (counts, amounts), user_data = await asyncio.gather(
+        ledger.summary(interaction.user.id),
+        user_repo.get_or_create(interaction.user.id)
+    )
     
-    total_earned = user_data.get("total_earned", 0)
-    total_worked = user_data.get("total_worked", 0)
-    total_bought = user_data.get("total_bought", 0)
-    total_robbed = user_data.get("total_robbed", 0)
-    total_got_robbed = user_data.get("total_got_robbed", 0)
-    total_fired = user_data.get("total_fired", 0)
-    total_commands_used = user_data.get("commands_used", 0)
+    total_earned = sum(amounts[kind] for kind in EARNED_KINDS)
+    total_worked = counts["work"]
+    total_bought = counts["buy"]
+    total_robbed = counts["rob"]
+    total_got_robbed = counts["robbed"]
+    total_fired = counts["fired"]
+    # Include increments that are still waiting for the next flush
+    total_commands_used = stat_counters.merged(user_data).get("commands_used", 0)
     
     msg = f"**VRTEX Economy Recap for {interaction.user.mention}**\n"
     msg += f"🪙 Coins earned: {total_earned}\n"
@@ -488,8 +689,6 @@ async def recap(interaction: Interaction):
 
 # -------------------- BOT RUN --------------------
 # Make sure your TOKEN is set in environment variables or directly
-
-from web_server import keep_alive
-keep_alive()
-bot.run(TOKEN)
+if __name__ == "__main__":  # bench.py imports this module to drive the commands
+    bot.run(TOKEN)
 
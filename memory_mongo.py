@@ -0,0 +1,688 @@
+# memory_mongo.py - in-memory stand-in for the parts of motor the bot uses
+#
+# Selected with MONGO_URI=memory:// (see main.py). bench.py uses it to run the
+# real command handlers without a MongoDB server. Every operation awaits
+# `latency` seconds first to model a network round trip, so the number of
+# operations a command makes shows up in its latency like it would in production.
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from functools import cmp_to_key
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+MISSING = object()
+
+TYPES = {
+    "array": list, "object": dict, "string": str, "bool": bool, "date": datetime,
+    "objectId": ObjectId, "int": int, "long": int, "double": float, "number": (int, float)
+}
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _get(doc, path: str):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return MISSING
+    return value
+
+
+def _set(doc: dict, path: str, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset(doc: dict, path: str):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def _is_operator_doc(value) -> bool:
+    return isinstance(value, dict) and bool(value) and all(key.startswith("$") for key in value)
+
+
+def _compare(a, b) -> int:
+    # Missing and null sort before every other value, as in MongoDB
+    a_null, b_null = a is MISSING or a is None, b is MISSING or b is None
+    if a_null or b_null:
+        return (not a_null) - (not b_null)
+    try:
+        return (a > b) - (a < b)
+    except TypeError:
+        return (type(a).__name__ > type(b).__name__) - (type(a).__name__ < type(b).__name__)
+
+
+def matches(doc: dict, query: dict) -> bool:
+    """MongoDB query semantics for the operators this codebase uses."""
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, q) for q in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, q) for q in condition):
+                return False
+        elif not _match_value(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _match_value(value, condition) -> bool:
+    if _is_operator_doc(condition):
+        return all(_match_operator(value, op, arg) for op, arg in condition.items())
+    if condition is None:
+        return value is MISSING or value is None
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    return value is not MISSING and value == condition
+
+
+def _match_operator(value, op: str, arg) -> bool:
+    if op == "$eq":
+        return _match_value(value, arg)
+    if op == "$ne":
+        return not _match_value(value, arg)
+    if op == "$in":
+        return any(_match_value(value, item) for item in arg)
+    if op == "$nin":
+        return not any(_match_value(value, item) for item in arg)
+    if op == "$exists":
+        return (value is not MISSING) == bool(arg)
+    if op == "$not":
+        return not _match_value(value, arg)
+    if op == "$type":
+        types = TYPES[arg] if arg != "null" else type(None)
+        return value is not MISSING and isinstance(value, types) and not (
+            isinstance(value, bool) and arg in ("int", "long", "number"))
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        if value is MISSING or value is None or arg is None:
+            return False
+        try:
+            if op == "$gt":
+                return value > arg
+            if op == "$gte":
+                return value >= arg
+            if op == "$lt":
+                return value < arg
+            return value <= arg
+        except TypeError:
+            return False
+    raise OperationFailure(f"memory_mongo: unsupported query operator {op}")
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False):
+    """Apply an update document (or a replacement) to `doc` in place."""
+    if not any(key.startswith("$") for key in update):
+        kept = doc.get("_id")
+        doc.clear()
+        doc.update(_copy(update))
+        doc.setdefault("_id", kept)
+        return
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for path, arg in fields.items():
+            current = _get(doc, path)
+            if op in ("$set", "$setOnInsert"):
+                _set(doc, path, _copy(arg))
+            elif op == "$unset":
+                _unset(doc, path)
+            elif op == "$inc":
+                _set(doc, path, (0 if current is MISSING else current) + arg)
+            elif op == "$min":
+                if current is MISSING or _compare(arg, current) < 0:
+                    _set(doc, path, arg)
+            elif op == "$max":
+                if current is MISSING or _compare(arg, current) > 0:
+                    _set(doc, path, arg)
+            elif op == "$push":
+                items = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                _set(doc, path, ([] if current is MISSING else current) + _copy(items))
+            elif op == "$pull":
+                if isinstance(current, list):
+                    _set(doc, path, [item for item in current if not _match_value(item, arg)])
+            else:
+                raise OperationFailure(f"memory_mongo: unsupported update operator {op}")
+
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return _copy(doc)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(fields.values()):
+        result = {}
+        for path in fields:
+            value = _get(doc, path)
+            if value is not MISSING:
+                _set(result, path, _copy(value))
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    result = _copy(doc)
+    for path, include in projection.items():
+        if not include:
+            _unset(result, path)
+    return result
+
+
+def sort_docs(docs: list, sort) -> list:
+    def cmp(a, b):
+        for field, direction in sort:
+            result = _compare(_get(a, field), _get(b, field))
+            if result:
+                return result * direction
+        return 0
+    return sorted(docs, key=cmp_to_key(cmp))
+
+
+class MemoryClient:
+    """AsyncIOMotorClient stand-in; databases are created on first access."""
+
+    def __init__(self, uri: str = "memory://", latency: float = 0.0):
+        self.latency = latency
+        self._databases = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self, name)
+        return self._databases[name]
+
+    def get_database(self, name):
+        return self[name]
+
+    async def start_session(self):
+        return MemorySession(self)
+
+    async def round_trip(self):
+        # Always yield, even with no latency, so concurrent commands interleave
+        await asyncio.sleep(self.latency)
+
+    def close(self):
+        pass
+
+
+class MemorySession:
+    """Accepted wherever motor takes `session=`; there is no isolation or rollback.
+
+    Each operation is applied atomically, which covers the single-document
+    conditional writes the bot relies on, but a transaction that fails half
+    way keeps its earlier writes.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def start_transaction(self, *args, **kwargs):
+        return self
+
+    async def with_transaction(self, callback, *args, **kwargs):
+        # Nothing here ever conflicts, so the callback runs exactly once
+        return await callback(self)
+
+    async def commit_transaction(self):
+        pass
+
+    async def abort_transaction(self):
+        pass
+
+    async def end_session(self):
+        pass
+
+
+class MemoryDatabase:
+    def __init__(self, client: MemoryClient, name: str):
+        self.client = client
+        self.name = name
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def get_collection(self, name):
+        return self[name]
+
+    async def list_collection_names(self):
+        await self.client.round_trip()
+        return [name for name, collection in self._collections.items() if collection._docs]
+
+    async def command(self, command, *args, **kwargs):
+        await self.client.round_trip()
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == "ping":
+            return {"ok": 1.0}
+        raise OperationFailure(f"memory_mongo: unsupported command {name}")
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        # Only the admin $currentOp progress query is issued at database level
+        return MemoryCursor(self.client, lambda cursor: [])
+
+
+class MemoryCollection:
+    """Collection stand-in.
+
+    Documents live in a dict keyed by _id. Top-level equality filters (e.g.
+    `{"user_id": ...}`) are served from per-field hash lookups built on first
+    use, so point reads stay O(1) however many users are seeded; anything
+    else scans. Index definitions are recorded but not enforced.
+    """
+
+    def __init__(self, database: MemoryDatabase, name: str):
+        self.database = database
+        self.name = name
+        self._docs = {}  # _id -> document
+        self._lookups = {}  # field -> value -> {_id: document}
+        self._indexes = {"_id_": [("_id", 1)]}
+
+    @property
+    def client(self):
+        return self.database.client
+
+    # ---- lookups ----
+    @staticmethod
+    def _lookup_keys(doc, field):
+        value = _get(doc, field)
+        values = value if isinstance(value, list) else [None if value is MISSING else value]
+        return [v for v in values if not isinstance(v, (dict, list))]
+
+    def _index_doc(self, doc, fields=None):
+        for field in self._lookups if fields is None else fields:
+            lookup = self._lookups[field]
+            for key in self._lookup_keys(doc, field):
+                lookup[key][doc["_id"]] = doc
+
+    def _unindex_doc(self, doc, fields=None):
+        for field in self._lookups if fields is None else fields:
+            lookup = self._lookups[field]
+            for key in self._lookup_keys(doc, field):
+                bucket = lookup.get(key)
+                if bucket is not None:
+                    bucket.pop(doc["_id"], None)
+                    if not bucket:
+                        del lookup[key]
+
+    def _candidates(self, query: dict):
+        best = None
+        for field, value in query.items():
+            if field.startswith("$") or isinstance(value, (dict, list)):
+                continue
+            lookup = self._lookups.get(field)
+            if lookup is None:
+                lookup = self._lookups[field] = defaultdict(dict)
+                for doc in self._docs.values():
+                    for key in self._lookup_keys(doc, field):
+                        lookup[key][doc["_id"]] = doc
+            bucket = lookup.get(value, {})
+            if best is None or len(bucket) < len(best):
+                best = bucket
+        return list((self._docs if best is None else best).values())
+
+    def _find(self, query: Optional[dict], sort=None, skip: int = 0, limit: int = 0) -> list:
+        query = query or {}
+        docs = [doc for doc in self._candidates(query) if matches(doc, query)]
+        if sort:
+            docs = sort_docs(docs, sort)
+        docs = docs[skip:]
+        return docs[:limit] if limit else docs
+
+    def _insert(self, doc: dict) -> dict:
+        doc = _copy(doc)
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs:
+            raise OperationFailure(f"E11000 duplicate key error collection: {self.name} index: _id_", 11000)
+        self._docs[doc["_id"]] = doc
+        self._index_doc(doc)
+        return doc
+
+    def _modify(self, doc: dict, update: dict, inserting: bool = False):
+        fields = None
+        if any(key.startswith("$") for key in update):
+            # Only lookups on fields the update writes can change
+            touched = {path.split(".")[0] for paths in update.values() for path in paths}
+            fields = [field for field in self._lookups if field.split(".")[0] in touched]
+        self._unindex_doc(doc, fields)
+        apply_update(doc, update, inserting)
+        self._index_doc(doc, fields)
+
+    def _upsert(self, query: dict, update: dict) -> dict:
+        doc = {}
+        for field, value in query.items():
+            if not field.startswith("$") and not _is_operator_doc(value):
+                _set(doc, field, _copy(value))
+        if not any(key.startswith("$") for key in update):
+            doc = {**({"_id": doc["_id"]} if "_id" in doc else {}), **_copy(update)}
+        else:
+            apply_update(doc, update, inserting=True)
+        return self._insert(doc)
+
+    def _update(self, query: dict, update: dict, upsert: bool, many: bool, sort=None) -> dict:
+        docs = self._find(query, sort=sort, limit=0 if many else 1)
+        for doc in docs:
+            self._modify(doc, update)
+        result = {"n": len(docs), "nModified": len(docs), "upserted": None}
+        if not docs and upsert:
+            result["upserted"] = self._upsert(query, update)["_id"]
+            result["n"] = 1
+        return result
+
+    def _delete(self, query: dict, many: bool) -> int:
+        docs = self._find(query, limit=0 if many else 1)
+        for doc in docs:
+            self._unindex_doc(doc)
+            del self._docs[doc["_id"]]
+        return len(docs)
+
+    # ---- motor API ----
+    async def find_one(self, filter=None, projection=None, *args, session=None, sort=None, **kwargs):
+        await self.client.round_trip()
+        docs = self._find(filter, sort=sort, limit=1)
+        return project(docs[0], projection) if docs else None
+
+    def find(self, filter=None, projection=None, *args, session=None, **kwargs):
+        return MemoryCursor(self.client, lambda cursor: [
+            project(doc, projection) for doc in self._find(filter, cursor._sort, cursor._skip, cursor._limit)
+        ])
+
+    async def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, session=None, **kwargs):
+        await self.client.round_trip()
+        docs = self._find(filter, sort=sort, limit=1)
+        if docs:
+            before = _copy(docs[0])
+            self._modify(docs[0], update)
+            return project(docs[0] if return_document == ReturnDocument.AFTER else before, projection)
+        if upsert:
+            doc = self._upsert(filter, update)
+            return project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        return None
+
+    async def find_one_and_replace(self, filter, replacement, projection=None, sort=None, upsert=False,
+                                   return_document=ReturnDocument.BEFORE, session=None, **kwargs):
+        return await self.find_one_and_update(filter, replacement, projection, sort, upsert,
+                                              return_document, session, **kwargs)
+
+    async def find_one_and_delete(self, filter, projection=None, sort=None, session=None, **kwargs):
+        await self.client.round_trip()
+        docs = self._find(filter, sort=sort, limit=1)
+        if not docs:
+            return None
+        self._unindex_doc(docs[0])
+        return project(self._docs.pop(docs[0]["_id"]), projection)
+
+    async def update_one(self, filter, update, upsert=False, session=None, **kwargs):
+        await self.client.round_trip()
+        return UpdateResult(self._update(filter, update, upsert, many=False), True)
+
+    async def update_many(self, filter, update, upsert=False, session=None, **kwargs):
+        await self.client.round_trip()
+        return UpdateResult(self._update(filter, update, upsert, many=True), True)
+
+    async def replace_one(self, filter, replacement, upsert=False, session=None, **kwargs):
+        await self.client.round_trip()
+        return UpdateResult(self._update(filter, replacement, upsert, many=False), True)
+
+    async def insert_one(self, document, session=None, **kwargs):
+        await self.client.round_trip()
+        doc = self._insert(document)
+        document.setdefault("_id", doc["_id"])
+        return InsertOneResult(doc["_id"], True)
+
+    async def insert_many(self, documents, ordered=True, session=None, **kwargs):
+        await self.client.round_trip()
+        ids = []
+        for document in documents:
+            doc = self._insert(document)
+            document.setdefault("_id", doc["_id"])
+            ids.append(doc["_id"])
+        return InsertManyResult(ids, True)
+
+    async def delete_one(self, filter, session=None, **kwargs):
+        await self.client.round_trip()
+        return DeleteResult({"n": self._delete(filter, many=False)}, True)
+
+    async def delete_many(self, filter, session=None, **kwargs):
+        await self.client.round_trip()
+        return DeleteResult({"n": self._delete(filter, many=True)}, True)
+
+    async def count_documents(self, filter, session=None, **kwargs):
+        await self.client.round_trip()
+        return len(self._find(filter))
+
+    async def estimated_document_count(self, **kwargs):
+        await self.client.round_trip()
+        return len(self._docs)
+
+    async def distinct(self, key, filter=None, session=None, **kwargs):
+        await self.client.round_trip()
+        values = []
+        for doc in self._find(filter):
+            value = _get(doc, key)
+            for item in (value if isinstance(value, list) else [value]):
+                if item is not MISSING and item not in values:
+                    values.append(item)
+        return values
+
+    async def bulk_write(self, requests, ordered=True, session=None, **kwargs):
+        """One round trip for the whole batch, like the real driver."""
+        await self.client.round_trip()
+        counts = defaultdict(int)
+        upserted = []
+        for index, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                self._insert(request._doc)
+                counts["nInserted"] += 1
+            elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+                many = isinstance(request, UpdateMany)
+                result = self._update(request._filter, request._doc, bool(request._upsert), many)
+                if result["upserted"] is not None:
+                    upserted.append({"index": index, "_id": result["upserted"]})
+                    counts["nUpserted"] += 1
+                else:
+                    counts["nMatched"] += result["n"]
+                    counts["nModified"] += result["nModified"]
+            elif isinstance(request, (DeleteOne, DeleteMany)):
+                counts["nRemoved"] += self._delete(request._filter, many=isinstance(request, DeleteMany))
+            else:
+                raise OperationFailure(f"memory_mongo: unsupported bulk operation {type(request).__name__}")
+        return BulkWriteResult({
+            "writeErrors": [], "writeConcernErrors": [], "upserted": upserted,
+            "nInserted": counts["nInserted"], "nUpserted": counts["nUpserted"],
+            "nMatched": counts["nMatched"], "nModified": counts["nModified"], "nRemoved": counts["nRemoved"]
+        }, True)
+
+    def aggregate(self, pipeline, *args, session=None, **kwargs):
+        def run(cursor):
+            # A leading $match is served from the lookups, like an index
+            if pipeline and "$match" in pipeline[0]:
+                return aggregate(self._find(pipeline[0]["$match"]), pipeline[1:])
+            return aggregate(list(self._docs.values()), pipeline)
+        return MemoryCursor(self.client, run)
+
+    async def create_index(self, keys, **kwargs):
+        await self.client.round_trip()
+        keys = [(keys, 1)] if isinstance(keys, str) else list(keys)
+        name = kwargs.get("name") or "_".join(f"{field}_{direction}" for field, direction in keys)
+        self._indexes[name] = keys
+        return name
+
+    async def create_indexes(self, indexes, session=None, **kwargs):
+        await self.client.round_trip()
+        names = []
+        for model in indexes:
+            document = model.document
+            self._indexes[document["name"]] = list(document["key"].items())
+            names.append(document["name"])
+        return names
+
+    async def index_information(self, session=None, **kwargs):
+        await self.client.round_trip()
+        return {name: {"key": keys} for name, keys in self._indexes.items()}
+
+    async def drop_index(self, name, session=None, **kwargs):
+        await self.client.round_trip()
+        del self._indexes[name]
+
+    async def drop(self, session=None, **kwargs):
+        await self.client.round_trip()
+        self._docs.clear()
+        self._lookups.clear()
+
+
+class MemoryCursor:
+    """Find/aggregate cursor; results are computed on the first fetch in one round trip."""
+
+    def __init__(self, client: MemoryClient, load):
+        self._client = client
+        self._load = load
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._docs = None
+        self._position = 0
+
+    def sort(self, key, direction=None):
+        self._sort = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    def hint(self, index):
+        return self
+
+    def max_time_ms(self, ms: int):
+        return self
+
+    async def _fetch(self):
+        if self._docs is None:
+            await self._client.round_trip()
+            self._docs = self._load(self)
+
+    async def to_list(self, length: Optional[int] = None):
+        await self._fetch()
+        end = len(self._docs) if length is None else self._position + length
+        docs = self._docs[self._position:end]
+        self._position += len(docs)
+        return docs
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self._fetch()
+        if self._position >= len(self._docs):
+            raise StopAsyncIteration
+        self._position += 1
+        return self._docs[self._position - 1]
+
+    async def explain(self):
+        return {"queryPlanner": {"winningPlan": {"stage": "MEMORY"}}}
+
+
+def aggregate(docs: list, pipeline: list) -> list:
+    """The pipeline stages used by migrations and reports: $match, $group, $sort, $skip, $limit, $project."""
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif name == "$sort":
+            docs = sort_docs(docs, list(spec.items()))
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$project":
+            docs = [project(doc, spec) for doc in docs]
+        elif name == "$group":
+            docs = _group(docs, spec)
+        else:
+            raise OperationFailure(f"memory_mongo: unsupported pipeline stage {name}")
+    return [_copy(doc) for doc in docs]
+
+
+def _expression(doc: dict, expression):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get(doc, expression[1:])
+        return None if value is MISSING else value
+    if isinstance(expression, dict) and not _is_operator_doc(expression):
+        return {key: _expression(doc, value) for key, value in expression.items()}
+    return expression
+
+
+def _group(docs: list, spec: dict) -> list:
+    groups = {}
+    for doc in docs:
+        key = _expression(doc, spec["_id"])
+        hashable = repr(key)
+        group = groups.get(hashable)
+        if group is None:
+            group = groups[hashable] = {"_id": key}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, argument), = accumulator.items()
+            value = _expression(doc, argument)
+            if op == "$sum":
+                group[field] = group.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+            elif op == "$push":
+                group.setdefault(field, []).append(value)
+            elif op == "$first":
+                group.setdefault(field, value)
+            elif op == "$last":
+                group[field] = value
+            elif op in ("$min", "$max"):
+                current = group.get(field, MISSING)
+                if current is MISSING or _compare(value, current) * (1 if op == "$max" else -1) > 0:
+                    group[field] = value
+            else:
+                raise OperationFailure(f"memory_mongo: unsupported accumulator {op}")
+    return list(groups.values())
@@ -0,0 +1,202 @@
+# migrations.py - one-shot data migrations
+#
+# Usage: python migrations.py <name> [<name> ...]
+# Each migration is idempotent, so re-running one after a crash is safe.
+import asyncio
+import os
+import sys
+
+import motor.motor_asyncio
+from pymongo import UpdateOne
+
+from inventory import LEGACY, SHOP_ITEMS, Catalog
+
+BATCH_SIZE = 1000
+
+
+async def guild_ids(db):
+    """Reconcile the server_id/guild_id split.
+
+    Old `/settings` writes went to documents keyed by `server_id` with flat
+    field names, while everything else reads `guild_id` documents. Fold each
+    `server_id` document into its `guild_id` document and move per-user
+    `server_id` tags into the guild_members collection.
+    """
+    servers = db.servers
+    moved = 0
+    async for legacy in servers.find({"server_id": {"$exists": True}}):
+        guild_id = legacy["server_id"]
+        fields = {}
+        if legacy.get("prefix"):
+            fields["custom_prefix"] = legacy["prefix"]
+        if legacy.get("currency_name"):
+            fields["currency.name"] = legacy["currency_name"]
+        if legacy.get("currency_symbol"):
+            fields["currency.symbol"] = legacy["currency_symbol"]
+        if "vRTEX_server_plus" in legacy:
+            fields["vrt_ex_server_plus"] = legacy["vRTEX_server_plus"]
+
+        target = await servers.find_one({"guild_id": guild_id, "_id": {"$ne": legacy["_id"]}})
+        if target:
+            if fields:
+                await servers.update_one({"_id": target["_id"]}, {"$set": fields})
+            await servers.delete_one({"_id": legacy["_id"]})
+        else:
+            # No canonical document yet: convert the legacy one in place
+            await servers.update_one(
+                {"_id": legacy["_id"]},
+                {"$set": {"guild_id": guild_id, **fields},
+                 "$unset": {"server_id": "", "prefix": "", "currency_name": "",
+                            "currency_symbol": "", "vRTEX_server_plus": ""}}
+            )
+        moved += 1
+    print(f"servers: reconciled {moved} server_id documents")
+
+    ops = []
+    tagged = 0
+    cursor = db.users.find({"server_id": {"$exists": True}}, {"user_id": 1, "server_id": 1, "balance": 1})
+    async for user in cursor.batch_size(BATCH_SIZE):
+        ops.append(UpdateOne(
+            {"guild_id": user["server_id"], "user_id": user["user_id"]},
+            {"$setOnInsert": {"balance": user.get("balance", 0)}},
+            upsert=True
+        ))
+        if len(ops) >= BATCH_SIZE:
+            await db.guild_members.bulk_write(ops, ordered=False)
+            tagged += len(ops)
+            ops = []
+    if ops:
+        await db.guild_members.bulk_write(ops, ordered=False)
+        tagged += len(ops)
+    await db.users.update_many({"server_id": {"$exists": True}}, {"$unset": {"server_id": ""}})
+    print(f"users: copied {tagged} server_id tags into guild_members")
+
+
+async def dedupe_users(db):
+    """Remove duplicate user documents so the unique user_id index can build.
+
+    Duplicates come from the old check-then-insert setup_user racing with
+    itself. Updates always matched the first document inserted, so that one
+    (lowest _id) is kept and the rest are deleted.
+    """
+    removed = 0
+    cursor = db.users.aggregate([
+        {"$group": {"_id": "$user_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    async for group in cursor:
+        extra = sorted(group["ids"])[1:]
+        result = await db.users.delete_many({"_id": {"$in": extra}})
+        removed += result.deleted_count
+    print(f"users: removed {removed} duplicate documents")
+
+
+async def inventory_counts(db):
+    """Convert list inventories (item names, one per purchase) to {item_id: count} maps.
+
+    Commands also convert a user's list the first time they touch it, so this
+    only speeds that up. Names that aren't in the catalog any more are dropped.
+    """
+    catalog = Catalog(SHOP_ITEMS)
+    ops = []
+    converted = 0
+    cursor = db.users.find(LEGACY, {"inventory": 1})
+    async for user in cursor.batch_size(BATCH_SIZE):
+        # The filter keeps this from overwriting an inventory converted meanwhile
+        ops.append(UpdateOne(
+            {"_id": user["_id"], **LEGACY},
+            {"$set": {"inventory": catalog.counts(user["inventory"])}}
+        ))
+        if len(ops) >= BATCH_SIZE:
+            await db.users.bulk_write(ops, ordered=False)
+            converted += len(ops)
+            ops = []
+    if ops:
+        await db.users.bulk_write(ops, ordered=False)
+        converted += len(ops)
+    print(f"users: converted {converted} list inventories")
+
+
+# Pre-ledger recap counters: handlers wrote them under different names, so
+# each ledger kind takes the larger of its two spellings
+LEGACY_COUNTERS = {
+    "work": ("total_worked", "times_worked"),
+    "buy": ("total_bought", "times_bought"),
+    "rob": ("total_robbed", "times_robbed_others"),
+    "robbed": ("total_got_robbed", "times_robbed"),
+    "fired": ("total_fired", "times_fired"),
+    "daily": ("daily_claims",),
+}
+LEGACY_FIELDS = [field for names in LEGACY_COUNTERS.values() for field in names] + ["total_earned"]
+
+
+async def ledger_baseline(db):
+    """Carry the old per-user recap counters into ledger snapshots, then drop them.
+
+    The counters become the snapshot's `baseline`, which is $set rather than
+    incremented, so re-running after a crash doesn't count anything twice.
+    """
+    query = {"$or": [{field: {"$exists": True}} for field in LEGACY_FIELDS]}
+    projection = {"user_id": 1, **{field: 1 for field in LEGACY_FIELDS}}
+    carried = 0
+
+    async def write(ops, user_ids):
+        await db.ledger_snapshots.bulk_write(ops, ordered=False)
+        await db.users.update_many(
+            {"user_id": {"$in": user_ids}},
+            {"$unset": {field: "" for field in LEGACY_FIELDS}}
+        )
+
+    ops, user_ids = [], []
+    async for user in db.users.find(query, projection).batch_size(BATCH_SIZE):
+        counts = {kind: max(user.get(field, 0) or 0 for field in fields)
+                  for kind, fields in LEGACY_COUNTERS.items()}
+        ops.append(UpdateOne(
+            {"user_id": user["user_id"]},
+            {"$set": {"baseline": {"counts": counts, "earned": user.get("total_earned", 0) or 0}}},
+            upsert=True
+        ))
+        user_ids.append(user["user_id"])
+        if len(ops) >= BATCH_SIZE:
+            await write(ops, user_ids)
+            carried += len(ops)
+            ops, user_ids = [], []
+    if ops:
+        await write(ops, user_ids)
+        carried += len(ops)
+    print(f"users: carried recap counters of {carried} users into ledger snapshots")
+
+
+async def drop_last_weekly(db):
+    """Drop last_weekly and its index; /weekly now records last_payout.weekly instead."""
+    if "last_weekly_1" in await db.users.index_information():
+        await db.users.drop_index("last_weekly_1")
+        print("users: dropped index last_weekly_1")
+    result = await db.users.update_many({"last_weekly": {"$exists": True}}, {"$unset": {"last_weekly": ""}})
+    print(f"users: removed last_weekly from {result.modified_count} users")
+
+
+MIGRATIONS = {
+    "guild_ids": guild_ids,
+    "dedupe_users": dedupe_users,
+    "inventory_counts": inventory_counts,
+    "ledger_baseline": ledger_baseline,
+    "drop_last_weekly": drop_last_weekly,
+}
+
+
+async def run(names):
+    client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URI"))
+    db = client.vrtex_economy
+    for name in names:
+        print(f"Running migration {name}...")
+        await MIGRATIONS[name](db)
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:]
+    unknown = [name for name in names if name not in MIGRATIONS]
+    if not names or unknown:
+        print(f"Usage: python migrations.py <{'|'.join(MIGRATIONS)}> ...")
+        sys.exit(1)
+    asyncio.run(run(names))
@@ -0,0 +1,100 @@
+import asyncio
+
+import aiohttp
+import discord
+
+
+class Notifier:
+    """Direct messages delivered in the background by a bounded pool of workers.
+
+    Commands call `notify` and return without waiting on Discord. Messages for
+    a user who already has one queued are coalesced into a single DM. Sends
+    that fail with a server or connection error are retried with exponential
+    backoff; users who don't accept DMs (Forbidden) or no longer exist
+    (NotFound) are dropped. At most `max_pending` users wait at once, so a
+    Discord outage can't grow the queue without bound.
+    """
+
+    def __init__(self, bot, workers: int = 4, max_pending: int = 10000,
+                 retries: int = 3, backoff: float = 1.0):
+        self.bot = bot
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retries = retries
+        self.backoff = backoff
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._pending = {}  # user_id -> messages, in the order notified
+        self._queue = asyncio.Queue()
+        self._tasks = []
+
+    def notify(self, user_id: int, message: str) -> bool:
+        """Queue a DM; False if it was dropped because the queue is full."""
+        messages = self._pending.get(user_id)
+        if messages is not None:
+            messages.append(message)
+            return True
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending[user_id] = [message]
+        self._queue.put_nowait(user_id)
+        return True
+
+    def __len__(self):
+        return len(self._pending)
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 5.0):
+        """Give queued DMs up to `timeout` seconds to go out, then stop the workers."""
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"Dropping {len(self._pending)} undelivered notifications on shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            user_id = await self._queue.get()
+            try:
+                # Everything queued for this user so far goes out as one DM
+                messages = self._pending.pop(user_id, [])
+                if messages:
+                    await self._deliver(user_id, "\n".join(messages))
+            except Exception as e:
+                self.failed += 1
+                print(f"Error sending notification to {user_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, user_id: int, content: str):
+        for attempt in range(self.retries + 1):
+            try:
+                user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+                await user.send(content)
+                self.sent += 1
+                return
+            except (discord.Forbidden, discord.NotFound):
+                self.dropped += 1  # DMs closed or account gone; retrying won't help
+                return
+            except discord.HTTPException as e:
+                if e.status < 500:
+                    self.failed += 1
+                    return
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        self.failed += 1
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "sent": self.sent,
+                "failed": self.failed, "dropped": self.dropped}
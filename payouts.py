@@ -0,0 +1,183 @@
+# payouts.py - scheduled payouts: weekly VRTEX+ payout and bank interest
+#
+# The bot runs these from a background loop. To check what a run would pay:
+#   python payouts.py <weekly|interest> --dry-run
+# Without --dry-run this pays out for real. Only do that with the bot stopped:
+# the running bot wouldn't see the new balances in its user cache or
+# leaderboards, and could turn down e.g. /buy on a stale cached balance.
+import asyncio
+import os
+import sys
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ASCENDING, IndexModel, UpdateMany, UpdateOne
+
+WEEKLY_PAYOUT = 7000
+
+INDEXES = [
+    # Who still has to be paid this period: {vRTEX_plus: true, last_payout.weekly: {$ne: key}}
+    IndexModel([("vRTEX_plus", ASCENDING), ("last_payout.weekly", ASCENDING)]),
+    IndexModel([("last_payout.interest", ASCENDING), ("bank", ASCENDING)])
+]
+
+
+def week_key(now: datetime) -> str:
+    year, week, _ = now.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def day_key(now: datetime) -> str:
+    return now.strftime("%Y-%m-%d")
+
+
+class WeeklyPayout:
+    """WEEKLY_PAYOUT coins to every VRTEX+ user, once per ISO week (shared with /weekly)."""
+
+    kind = "weekly"
+    target = "balance"
+    projection = {"user_id": 1}
+
+    def __init__(self, amount: int = WEEKLY_PAYOUT):
+        self.payout = amount
+
+    def key(self, now: datetime) -> str:
+        return week_key(now)
+
+    def query(self) -> dict:
+        return {"vRTEX_plus": True}
+
+    def amount(self, user: dict) -> int:
+        return self.payout
+
+
+class BankInterest:
+    """`rate` of each user's bank balance added to the bank once per day, at most `cap` (0 = no cap)."""
+
+    kind = "interest"
+    target = "bank"
+    projection = {"user_id": 1, "bank": 1}
+
+    def __init__(self, rate: float, cap: int = 0):
+        self.rate = rate
+        self.cap = cap
+
+    def key(self, now: datetime) -> str:
+        return day_key(now)
+
+    def query(self) -> dict:
+        return {"bank": {"$gt": 0}}
+
+    def amount(self, user: dict) -> int:
+        interest = int(user.get("bank", 0) * self.rate)
+        return min(interest, self.cap) if self.cap else interest
+
+
+class PayoutEngine:
+    """Applies a payout to every eligible user in streamed, bulk-written batches.
+
+    Each user document records the key of the last period it was paid for
+    (`last_payout.<kind>`), and every update is filtered on that key not
+    being set yet. A run that crashes part way can simply be run again:
+    users it already paid no longer match, so nobody is paid twice. Users
+    are read from a cursor `batch_size` at a time and the loop yields
+    between batches, so a run over millions of users neither holds them in
+    memory nor stalls command handling.
+    """
+
+    def __init__(self, collection, cache, ledger, members=None, batch_size: int = 1000):
+        self.collection = collection
+        self.cache = cache
+        self.ledger = ledger
+        self.members = members  # guild_members collection, kept in step with balance payouts
+        self.batch_size = batch_size
+
+    async def run(self, payout, dry_run: bool = False, now: Optional[datetime] = None) -> dict:
+        """Pay everyone still owed for the current period; returns users and coins paid (or projected)."""
+        key = payout.key(now or datetime.utcnow())
+        done = f"last_payout.{payout.kind}"
+        query = {**payout.query(), done: {"$ne": key}}
+        # Marks the documents this run wrote, to tell them apart from /weekly claims
+        run_id = uuid.uuid4().hex
+        totals = {"kind": payout.kind, "key": key, "dry_run": dry_run, "users": 0, "amount": 0}
+
+        chunk = []
+        cursor = self.collection.find(query, payout.projection)
+        async for user in cursor.batch_size(self.batch_size):
+            amount = payout.amount(user)
+            if amount <= 0:
+                continue
+            chunk.append((user, amount))
+            if len(chunk) >= self.batch_size:
+                await self._pay(payout, chunk, query, key, run_id, dry_run, totals)
+                chunk = []
+        if chunk:
+            await self._pay(payout, chunk, query, key, run_id, dry_run, totals)
+        return totals
+
+    async def _pay(self, payout, chunk: list, query: dict, key: str, run_id: str, dry_run: bool, totals: dict):
+        if not dry_run:
+            chunk = await self._write(payout, chunk, query, key, run_id)
+        totals["users"] += len(chunk)
+        totals["amount"] += sum(amount for _, amount in chunk)
+        # Let command handlers run between batches
+        await asyncio.sleep(0)
+
+    async def _write(self, payout, chunk: list, query: dict, key: str, run_id: str) -> list:
+        done = f"last_payout.{payout.kind}"
+        ops = [
+            UpdateOne(
+                {"_id": user["_id"], **query},
+                {"$inc": {payout.target: amount}, "$set": {done: key, f"{done}_run": run_id}}
+            )
+            for user, amount in chunk
+        ]
+        result = await self.collection.bulk_write(ops, ordered=False)
+        if result.modified_count < len(chunk):
+            # Some users were paid elsewhere (e.g. /weekly) after the cursor read them
+            paid = await self.collection.find(
+                {"_id": {"$in": [user["_id"] for user, _ in chunk]}, f"{done}_run": run_id}, {"_id": 1}
+            ).to_list(None)
+            ids = {doc["_id"] for doc in paid}
+            chunk = [(user, amount) for user, amount in chunk if user["_id"] in ids]
+
+        by_amount = defaultdict(list)
+        for user, amount in chunk:
+            self.cache.invalidate(user["user_id"])
+            self.ledger.record(user["user_id"], payout.kind, amount)
+            by_amount[amount].append(user["user_id"])
+        if self.members is not None and payout.target == "balance" and by_amount:
+            await self.members.bulk_write([
+                UpdateMany({"user_id": {"$in": user_ids}}, {"$inc": {"balance": amount}})
+                for amount, user_ids in by_amount.items()
+            ], ordered=False)
+        await self.ledger.flush()
+        return chunk
+
+
+async def main(kind: str, dry_run: bool):
+    import motor.motor_asyncio
+
+    from ledger import Ledger
+    from user_cache import UserCache
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URI"))
+    db = client.vrtex_economy
+    payout = WeeklyPayout() if kind == "weekly" else BankInterest(
+        float(os.getenv("BANK_INTEREST_RATE", "0")), int(os.getenv("BANK_INTEREST_CAP", "0")))
+    engine = PayoutEngine(db.users, UserCache(), Ledger(client, db.ledger, db.ledger_snapshots), db.guild_members)
+    totals = await engine.run(payout, dry_run=dry_run)
+    verb = "Would pay" if dry_run else "Paid"
+    print(f"{verb} {totals['amount']} coins to {totals['users']} users ({totals['kind']} {totals['key']})")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    dry_run = "--dry-run" in args
+    kinds = [arg for arg in args if arg != "--dry-run"]
+    if len(kinds) != 1 or kinds[0] not in ("weekly", "interest"):
+        print("Usage: python payouts.py <weekly|interest> [--dry-run]")
+        sys.exit(1)
+    asyncio.run(main(kinds[0], dry_run))
@@ -0,0 +1,95 @@
+# shard_launcher.py - run the bot's shards across several processes
+#
+# Usage: python shard_launcher.py <shard_count> <processes>
+# Shards are split into contiguous ranges, one per process. Process i runs
+# main.py with SHARD_COUNT/SHARD_IDS set to its range and PORT=PORT+i for its
+# health/metrics server. Only the process with shard 0 runs the scheduled jobs
+# (sweeps, payouts, ledger compaction). A process that exits is restarted with
+# exponential backoff; Ctrl+C or SIGTERM shuts every process down cleanly.
+import asyncio
+import os
+import signal
+import sys
+
+BASE_PORT = int(os.getenv("PORT", "8080"))
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+IDENTIFY_SECONDS = 5  # Discord allows one identify per 5 seconds
+RESTART_DELAY = 5
+MAX_RESTART_DELAY = 300
+STABLE_SECONDS = 60  # a process that ran this long resets its backoff
+STOP_TIMEOUT = 30
+
+
+def shard_ranges(shard_count: int, processes: int) -> list:
+    per_process = -(-shard_count // processes)
+    return [list(range(start, min(start + per_process, shard_count)))
+            for start in range(0, shard_count, per_process)]
+
+
+async def supervise(index: int, shard_ids: list, shard_count: int, delay: float, stopping: asyncio.Event):
+    name = f"Process {index} (shards {shard_ids[0]}-{shard_ids[-1]})"
+    env = {**os.environ, "SHARD_COUNT": str(shard_count),
+           "SHARD_IDS": ",".join(map(str, shard_ids)), "PORT": str(BASE_PORT + index)}
+    backoff = RESTART_DELAY
+    loop = asyncio.get_running_loop()
+    while True:
+        # Staggered start so processes don't all identify at once
+        try:
+            await asyncio.wait_for(stopping.wait(), delay)
+            return
+        except asyncio.TimeoutError:
+            pass
+
+        started = loop.time()
+        # Own session: a terminal Ctrl+C reaches the launcher only, which then stops each process once
+        process = await asyncio.create_subprocess_exec(sys.executable, MAIN, env=env, start_new_session=True)
+        print(f"{name} started, pid {process.pid}")
+        exited = asyncio.ensure_future(process.wait())
+        stop = asyncio.ensure_future(stopping.wait())
+        await asyncio.wait({exited, stop}, return_when=asyncio.FIRST_COMPLETED)
+        if stop.done():
+            # SIGINT lets bot.run close the bot, which flushes pending writes
+            if process.returncode is None:
+                process.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(exited, STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"{name} didn't stop in {STOP_TIMEOUT}s, killing it")
+                process.kill()
+                await exited
+            print(f"{name} stopped")
+            return
+        stop.cancel()
+
+        if loop.time() - started >= STABLE_SECONDS:
+            backoff = RESTART_DELAY
+        print(f"{name} exited with code {exited.result()}, restarting in {backoff}s")
+        delay = backoff
+        backoff = min(backoff * 2, MAX_RESTART_DELAY)
+
+
+async def main(shard_count: int, processes: int):
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    ranges = shard_ranges(shard_count, processes)
+    started = 0
+    tasks = []
+    for index, shard_ids in enumerate(ranges):
+        tasks.append(supervise(index, shard_ids, shard_count, started * IDENTIFY_SECONDS, stopping))
+        started += len(shard_ids)
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) != 2 or not all(arg.isdigit() and int(arg) > 0 for arg in args):
+        print("Usage: python shard_launcher.py <shard_count> <processes>")
+        sys.exit(1)
+    shard_count, processes = int(args[0]), int(args[1])
+    if processes > shard_count:
+        print(f"Can't split {shard_count} shards over {processes} processes")
+        sys.exit(1)
+    asyncio.run(main(shard_count, processes))
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+
+def stale(cutoff: datetime) -> dict:
+    """Employed users (jobs are numbered from 1) whose last shift is before `cutoff`.
+
+    Users hired since `cutoff` are left alone, even if their last shift was
+    for a job they were fired from. Served by the (job, last_work) index, so
+    users already fired are never rescanned.
+    """
+    return {"job": {"$gt": 0}, "last_work": {"$lt": cutoff}, "hired_at": {"$not": {"$gte": cutoff}}}
+
+
+class InactivitySweeper:
+    """Fires users who haven't worked for `fire_after` and resets their streaks.
+
+    Matching users are streamed from an index-backed cursor and updated in
+    chunks of `batch_size` with one unordered bulk_write each, so memory
+    stays constant however many users are swept. Each update repeats the
+    staleness check, so a user who works while the sweep runs keeps their job.
+    """
+
+    def __init__(self, collection, cache, ledger, notifier,
+                 fire_after: timedelta = timedelta(days=2), batch_size: int = 1000):
+        self.collection = collection
+        self.cache = cache
+        self.ledger = ledger
+        self.notifier = notifier
+        self.fire_after = fire_after
+        self.batch_size = batch_size
+
+    async def sweep(self) -> int:
+        """Run one pass; returns the number of users fired."""
+        cutoff = datetime.utcnow() - self.fire_after
+        cursor = self.collection.find(stale(cutoff), {"user_id": 1, "work_streak": 1})
+        fired = 0
+        chunk = []
+        async for user in cursor.batch_size(self.batch_size):
+            chunk.append(user)
+            if len(chunk) >= self.batch_size:
+                fired += await self._fire(chunk, cutoff)
+                chunk = []
+        if chunk:
+            fired += await self._fire(chunk, cutoff)
+        return fired
+
+    async def _fire(self, users: list, cutoff: datetime) -> int:
+        ops = [
+            UpdateOne({"_id": user["_id"], **stale(cutoff)}, {"$set": {"job": None, "work_streak": 0}})
+            for user in users
+        ]
+        result = await self.collection.bulk_write(ops, ordered=False)
+        if result.modified_count < len(users):
+            # Some users worked after the cursor read them; only the rest were fired
+            still_stale = await self.collection.find(
+                {"_id": {"$in": [user["_id"] for user in users]}, "job": None, "last_work": {"$lt": cutoff}},
+                {"_id": 1}
+            ).to_list(None)
+            ids = {doc["_id"] for doc in still_stale}
+            users = [user for user in users if user["_id"] in ids]
+
+        for user in users:
+            self.cache.invalidate(user["user_id"])
+            self.ledger.record(user["user_id"], "fired")
+            streak = user.get("work_streak", 0)
+            lost = f" Your {streak}-shift work streak was reset." if streak else ""
+            self.notifier.notify(
+                user["user_id"],
+                f"You missed work for {self.fire_after.days} days. You are fired from your job!{lost}"
+            )
+        # Keep the ledger buffer from growing with the size of the sweep
+        await self.ledger.flush()
+        return len(users)
@@ -0,0 +1,184 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+ASYNC_OPS = {
+    "find_one", "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+    "update_one", "update_many", "insert_one", "insert_many", "replace_one",
+    "delete_one", "delete_many", "bulk_write", "count_documents", "distinct"
+}
+CURSOR_OPS = {"find", "aggregate"}
+OP_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21)
+
+
+class CommandTrace:
+    """What one command invocation spent: wall time, Mongo time and each op."""
+
+    __slots__ = ("command", "started", "mongo_seconds", "ops")
+
+    def __init__(self, command: str):
+        self.command = command
+        self.started = time.perf_counter()
+        self.mongo_seconds = 0.0
+        self.ops = []  # (op, seconds) in call order
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def breakdown(self) -> str:
+        return ", ".join(f"{op} {seconds * 1000:.1f}ms" for op, seconds in self.ops)
+
+
+# Trace of the command whose handler is running in the current task, if any
+current_trace: ContextVar[Optional[CommandTrace]] = ContextVar("current_trace", default=None)
+
+
+class Tracer:
+    """Per-command latency and MongoDB operation instrumentation.
+
+    `start` is called when a command is admitted and `finish` when its handler
+    completes or fails; collections wrapped with `collection()` add every
+    operation (and the time spent awaiting it) to the trace of the command
+    running in the current task. Invocations slower than `slow_ms` are logged
+    with their op breakdown; 0 disables the log.
+    """
+
+    def __init__(self, registry, slow_ms: float = 0):
+        self.slow_ms = slow_ms
+        self.latency = registry.histogram(
+            "vrtex_command_latency_seconds", "Slash command handler latency", ("command",))
+        self.mongo_time = registry.histogram(
+            "vrtex_command_mongo_seconds", "Time a command spent awaiting MongoDB", ("command",))
+        self.op_counts = registry.histogram(
+            "vrtex_command_mongo_ops", "MongoDB operations per command invocation", ("command",),
+            buckets=OP_COUNT_BUCKETS)
+        self.commands = registry.counter(
+            "vrtex_commands_total", "Slash command invocations by outcome", ("command", "status"))
+        self.mongo_ops = registry.counter(
+            "vrtex_mongo_ops_total", "MongoDB operations by command and operation type", ("command", "op"))
+        self.op_latency = registry.histogram(
+            "vrtex_mongo_op_seconds", "MongoDB operation latency by operation type", ("op",))
+
+    def collection(self, collection):
+        return TracedCollection(collection, self)
+
+    def start(self, interaction, command: str):
+        interaction.extras["trace"] = self.begin(command)
+
+    def finish(self, interaction, status: str):
+        trace = interaction.extras.get("trace")
+        if trace is not None:
+            self.end(trace, status)
+
+    def reject(self, command: str):
+        self.commands.inc(command=command, status="rejected")
+
+    def begin(self, command: str) -> CommandTrace:
+        trace = CommandTrace(command)
+        current_trace.set(trace)
+        return trace
+
+    def end(self, trace: CommandTrace, status: str = "ok"):
+        elapsed = trace.elapsed()
+        self.latency.observe(elapsed, command=trace.command)
+        self.mongo_time.observe(trace.mongo_seconds, command=trace.command)
+        self.op_counts.observe(len(trace.ops), command=trace.command)
+        self.commands.inc(command=trace.command, status=status)
+        if self.slow_ms and elapsed * 1000 >= self.slow_ms:
+            print(f"Slow command /{trace.command} ({status}): {elapsed * 1000:.1f}ms total, "
+                  f"{trace.mongo_seconds * 1000:.1f}ms in Mongo over {len(trace.ops)} ops"
+                  + (f" [{trace.breakdown()}]" if trace.ops else ""))
+
+    @contextmanager
+    def span(self, command: str):
+        """Trace a block outside a slash command (background jobs, benchmarks)."""
+        trace = CommandTrace(command)
+        token = current_trace.set(trace)
+        status = "error"
+        try:
+            yield trace
+            status = "ok"
+        finally:
+            current_trace.reset(token)
+            self.end(trace, status)
+
+    def record_op(self, op: str, seconds: float):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.mongo_seconds += seconds
+            trace.ops.append((op, seconds))
+        self.mongo_ops.inc(command=trace.command if trace else "background", op=op)
+        self.op_latency.observe(seconds, op=op)
+
+
+class TracedCollection:
+    """Motor collection proxy that times each operation for a Tracer."""
+
+    def __init__(self, collection, tracer: Tracer):
+        self._collection = collection
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in ASYNC_OPS:
+            async def traced(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await attr(*args, **kwargs)
+                finally:
+                    self._tracer.record_op(name, time.perf_counter() - started)
+            return traced
+        if name in CURSOR_OPS:
+            def traced_cursor(*args, **kwargs):
+                return TracedCursor(attr(*args, **kwargs), name, self._tracer)
+            return traced_cursor
+        return attr
+
+
+class TracedCursor:
+    """Cursor proxy; the time spent fetching batches is recorded as one op."""
+
+    def __init__(self, cursor, op: str, tracer: Tracer):
+        self._cursor = cursor
+        self._op = op
+        self._tracer = tracer
+        self._seconds = 0.0
+        self._recorded = False
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name in ("sort", "limit", "skip", "batch_size", "hint", "max_time_ms"):
+            # Builder methods return the same cursor; keep returning the proxy
+            def chained(*args, **kwargs):
+                attr(*args, **kwargs)
+                return self
+            return chained
+        return attr
+
+    async def to_list(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self._cursor.to_list(*args, **kwargs)
+        finally:
+            self._seconds += time.perf_counter() - started
+            self._record()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        started = time.perf_counter()
+        try:
+            doc = await self._cursor.__anext__()
+        except StopAsyncIteration:
+            self._seconds += time.perf_counter() - started
+            self._record()
+            raise
+        self._seconds += time.perf_counter() - started
+        return doc
+
+    def _record(self):
+        if not self._recorded:
+            self._recorded = True
+            self._tracer.record_op(self._op, self._seconds)
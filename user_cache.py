@@ -0,0 +1,40 @@
+from typing import Optional
+
+from ttl_cache import TTLCache
+
+
+class UserCache(TTLCache):
+    """Bounded LRU + TTL cache of recently active user documents.
+
+    The cache never loads anything itself: UserRepository and EconomyOps put
+    every document a write returns (write-through) and drop a user whenever a
+    conditional write fails, so a cached document is at worst `ttl` seconds
+    behind writes made by other processes.
+
+    `exclusive` says this process is the only one running commands. Only then
+    may a cached balance, inventory or flag reject a request; with several
+    processes those can have grown elsewhere, and only cooldown timestamps
+    (which never move back) are safe to reject on.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0, exclusive: bool = True):
+        super().__init__(max_size, ttl)
+        self.exclusive = exclusive
+
+    def get(self, user_id: int) -> Optional[dict]:
+        return self._lookup(user_id)
+
+    def put(self, doc: Optional[dict]):
+        if not doc:
+            return
+        self._store(doc["user_id"], doc)
+
+    def apply_inc(self, user_id: int, amounts: dict):
+        """Mirror an $inc that was written without returning the document."""
+        doc = self._peek(user_id)
+        if doc is not None:
+            for field, amount in amounts.items():
+                doc[field] = doc.get(field, 0) + amount
+
+    def invalidate(self, user_id: int):
+        self._discard(user_id)
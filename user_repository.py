@@ -0,0 +1,72 @@
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+from user_cache import UserCache
+
+# Fields every user document starts with; user_id comes from the query
+DEFAULT_USER = {
+    "balance": 0,
+    "bank": 0,
+    "work_streak": 0,
+    "job": None,
+    "job_level": 1,
+    "commands_used": 0
+}
+
+
+def upsert_update(fields: Optional[dict] = None, inc: Optional[dict] = None) -> dict:
+    """Build an update that applies $set/$inc and fills in defaults on insert."""
+    fields = fields or {}
+    inc = inc or {}
+    # $setOnInsert may not touch a path that $set/$inc already writes
+    update = {"$setOnInsert": {k: v for k, v in DEFAULT_USER.items() if k not in fields and k not in inc}}
+    if fields:
+        update["$set"] = fields
+    if inc:
+        update["$inc"] = inc
+    return update
+
+
+class UserRepository:
+    """Single-round-trip access to user documents.
+
+    Missing users are created with DEFAULT_USER inside the same upsert that
+    reads or writes them, so commands never need a separate setup step.
+    Reads are served from `cache` when possible and every write refreshes it.
+    """
+
+    def __init__(self, collection, cache: Optional[UserCache] = None):
+        self.collection = collection
+        self.cache = cache if cache is not None else UserCache()
+
+    async def get_or_create(self, user_id: int) -> dict:
+        """Return the user's document, inserting defaults if it doesn't exist."""
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return cached
+        doc = await self.collection.find_one_and_update(
+            {"user_id": user_id},
+            {"$setOnInsert": DEFAULT_USER},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self.cache.put(doc)
+        return doc
+
+    async def update(self, user_id: int, fields: Optional[dict] = None, inc: Optional[dict] = None) -> dict:
+        """Apply $set/$inc to a user (creating them if needed) and return the new document."""
+        doc = await self.collection.find_one_and_update(
+            {"user_id": user_id},
+            upsert_update(fields, inc),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self.cache.put(doc)
+        return doc
+
+    async def set_fields(self, user_id: int, **fields) -> dict:
+        return await self.update(user_id, fields=fields)
+
+    async def increment(self, user_id: int, **amounts: int) -> dict:
+        return await self.update(user_id, inc=amounts)
@@ -1,15 +1,37 @@
-from flask import Flask
-from threading import Thread
+import asyncio
 
-app = Flask('')
+from aiohttp import web
 
-@app.route('/')
-def home():
-    return "Bot is alive!"
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
+def create_app(bot, db, registry) -> web.Application:
+    """Health, readiness and Prometheus metrics endpoints for the bot."""
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+    async def home(request):
+        return web.Response(text="Bot is alive!")
+
+    async def ready(request):
+        checks = {"gateway": bot.is_ready() and not bot.is_closed()}
+        try:
+            await asyncio.wait_for(db.command("ping"), timeout=2)
+            checks["mongo"] = True
+        except Exception:
+            checks["mongo"] = False
+        status = 200 if all(checks.values()) else 503
+        return web.json_response(checks, status=status)
+
+    async def metrics(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/", home)
+    app.router.add_get("/ready", ready)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+async def start_web_server(bot, db, registry, host: str = "0.0.0.0", port: int = 8080) -> web.AppRunner:
+    """Serve the app on the bot's own event loop (no extra thread)."""
+    runner = web.AppRunner(create_app(bot, db, registry), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner